@@ -1,183 +1,130 @@
+"""
+command line entry point, the stages and their dependencies are only imported once the arguments are parsed
+"""
 import argparse
-import logging
-import numpy as np
 import os
-import pandas as pd
-from datetime import date
-from dotenv import load_dotenv
-from github import Github
+from glob import glob
 from pathlib import Path
-from py_data_rules.rule_engine import RuleEngine
-from py_data_rules.data_type import XSDDate
-from .data_model import generate_data_model
-from .pipeline import Pipeline
-from .rules import generate_rules
 
-parser = argparse.ArgumentParser()
-parser.add_argument('--dev', action='store_true')
-args = parser.parse_args()
-
-if args.dev:
-    assert Path(".env").exists(), ".env file is missing"
-    load_dotenv(override=True)
-
-GITHUB_WORKSPACE = Path(os.getenv("GITHUB_WORKSPACE"))
-GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
-GITHUB_REPOSITORY = os.getenv("GITHUB_REPOSITORY")
-WATER_LOGSHEET_URL = os.getenv("WATER_LOGSHEET_URL")
-SEDIMENT_LOGSHEET_URL = os.getenv("SEDIMENT_LOGSHEET_URL")
-HARD_LOGSHEET_URL = os.getenv("HARD_LOGSHEET_URL")
-DATA_QUALITY_CONTROL_THRESHOLD_DATE = os.getenv("DATA_QUALITY_CONTROL_THRESHOLD_DATE")
-DATA_QUALITY_CONTROL_ASSIGNEE = os.getenv("DATA_QUALITY_CONTROL_ASSIGNEE")
-
-LOGSHEETS_PATH = GITHUB_WORKSPACE / "logsheets/raw"
-
-LOGSHEETS_FILTERED_PATH = GITHUB_WORKSPACE / "logsheets/filtered"
-LOGSHEETS_FILTERED_PATH.mkdir(parents=True, exist_ok=True)
-
-LOGSHEETS_TRANSFORMED_PATH = GITHUB_WORKSPACE / "logsheets/transformed"
-LOGSHEETS_TRANSFORMED_PATH.mkdir(parents=True, exist_ok=True)
-
-DQC_PATH = GITHUB_WORKSPACE / "data-quality-control"
-DQC_PATH.mkdir(parents=True, exist_ok=True)
-
-msg = f"DATA_QUALITY_CONTROL_THRESHOLD_DATE `{DATA_QUALITY_CONTROL_THRESHOLD_DATE}` is not a valid date (expected format: YYYY-MM-DD)"
-assert XSDDate().match(DATA_QUALITY_CONTROL_THRESHOLD_DATE), msg
-
-logging.basicConfig(filename=DQC_PATH / "logfile", filemode="w", level=logging.INFO)
-
-
-def filter_logsheets(
-    habitat,
-):  # i.e. discarding samples and measurements taken after the data_quality_control_threshold_date
-    df_sampling = pd.read_csv(
-        LOGSHEETS_PATH / f"{habitat}_sampling.csv", dtype=object, keep_default_na=False
-    )
-    df_sampling.loc[pd.to_datetime(df_sampling["collection_date"]) >= DATA_QUALITY_CONTROL_THRESHOLD_DATE] = ""
-    df_sampling.to_csv(LOGSHEETS_FILTERED_PATH / f"{habitat}_sampling.csv", index=False)
-
-    df_measured = pd.read_csv(
-        LOGSHEETS_PATH / f"{habitat}_measured.csv", dtype=object, keep_default_na=False
-    )
-    df_measured.loc[
-        ~df_measured["source_mat_id"].isin(df_sampling["source_mat_id"])
-    ] = ""
-    df_measured.to_csv(LOGSHEETS_FILTERED_PATH / f"{habitat}_measured.csv", index=False)
-
-    df_observatory = pd.read_csv(
-        LOGSHEETS_PATH / f"{habitat}_observatory.csv",
-        dtype=object,
-        keep_default_na=False,
-    )
-    df_observatory.to_csv(
-        LOGSHEETS_FILTERED_PATH / f"{habitat}_observatory.csv", index=False
-    )
-
-
-def create_report(input_path, output_path):
-    df = pd.read_csv(input_path)
-    df_report = pd.DataFrame()
-    df_report["Diagnosis"] = df["diagnosis"]
-    df_report["LogsheetType"] = np.select(
-        [df["table"].str[0] == "s", df["table"].str[0] == "w"],
-        ["sediment", "water"],
-        default="NULL"
-    )
-    df_report["LogsheetTab"] = np.select(
-        [
-            df["table"].str[1] == "m",
-            df["table"].str[1] == "o",
-            df["table"].str[1] == "s",
-        ],
-        ["measured", "observatory", "sampling"],
-        default="NULL"
-    )
-    df_report["Column"] = df["column"]
-    df_report["Row"] = df["row"]
-    df_report["Value"] = np.where(df["value"].isna(), "<empty>", df["value"])
-    df_report["Repair"] = df["repair"]
-    df_report["ExtendedDiagnosis"] = df["extended_diagnosis"]
-    df_report["ExtendedDiagnosis"] = np.where(
-        df["extended_diagnosis"].isna(), "\\", df["extended_diagnosis"]
-    )
-    df_report["FilePath"] = df["file_path"]
-    df_report["DataType"] = df["data_type"]
-    df_report["Requirement"] = np.select(
-        [df["nullable"] == True, df["nullable"] == False],
-        ["optional", "mandatory"],
-        default="NULL"
-    )
-    df_report = df_report[df_report["Repair"].isna()]
-    df_report = df_report.drop(columns=["Repair"])
-    df_report.to_csv(output_path, index=False)
-
-
-def create_issue():
-    repo = Github(GITHUB_TOKEN).get_repo(GITHUB_REPOSITORY)
-    repo.create_issue(
-        title=f"Data Quality Control {date.today()}",
-        body=(
-            f"A new [logfile](https://github.com/{GITHUB_REPOSITORY}/blob/main/data-quality-control/logfile) and [report](https://github.com/{GITHUB_REPOSITORY}/blob/main/data-quality-control/report.csv) are available. "
-            f"Have a look at the logfile first to see if any problems were encountered during the data quality control.\n\n"
-            f"Data were controlled up to {DATA_QUALITY_CONTROL_THRESHOLD_DATE}, this date can be changed by modifying the `data_quality_control_threshold_date` in [governance-data/logsheets.csv](https://github.com/emo-bon/governance-data/blob/main/logsheets.csv) (date format is YYYY-MM-DD)."
-        ),
-        assignee=DATA_QUALITY_CONTROL_ASSIGNEE,
-    )
 
 if __name__ == "__main__":
-    alias2basename_sediment = {
-        "sm": "sediment_measured",
-        "so": "sediment_observatory",
-        "ss": "sediment_sampling",
-    }
-    alias2basename_water = {
-        "wm": "water_measured",
-        "wo": "water_observatory",
-        "ws": "water_sampling",
-    }
-
-    if SEDIMENT_LOGSHEET_URL and WATER_LOGSHEET_URL:
-        habitat = "all"
-        alias2basename = {**alias2basename_sediment, **alias2basename_water}
-        filter_logsheets("sediment")
-        filter_logsheets("water")
-    elif SEDIMENT_LOGSHEET_URL:
-        habitat = "sediment"
-        alias2basename = alias2basename_sediment
-        filter_logsheets("sediment")
-    elif WATER_LOGSHEET_URL:
-        habitat = "water"
-        alias2basename = alias2basename_water
-        filter_logsheets("water")
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dev', action='store_true')
+    parser.add_argument('--incremental', action='store_true', help="only revalidate the rows that changed since the previous run")
+    parser.add_argument('--full-rebuild', action='store_true', help="ignore the manifest of the previous run")
+    parser.add_argument('--rule-workers', type=int, default=4, help="number of threads running the rules concurrently, 1 runs them serially")
+    parser.add_argument('--profile', action='store_true', help="dump a cProfile of the run to data-quality-control/profile.pstats (the rules then run serially, whatever --rule-workers)")
+    parser.add_argument('--batch', nargs="+", metavar="WORKSPACE", help="crate workspaces (or glob patterns) to run in a process pool, instead of GITHUB_WORKSPACE")
+    parser.add_argument('--workers', type=int, help="number of worker processes in batch mode")
+    parser.add_argument('--cache-dir', type=Path, default=Path("data-quality-control-cache"), help="lookup cache shared by the crates in batch mode")
+    parser.add_argument('--columnar', action='store_true', help="also write parquet sidecars of the transformed logsheets and of dqc.csv (requires pyarrow)")
+    parser.add_argument('--raw-cache', action='store_true', help="keep a parquet copy of each raw logsheet so unchanged logsheets are not parsed again (requires pyarrow)")
+    parser.add_argument('--compact', action='store_true', help="hold the logsheets in memory as categoricals or interned strings, chosen per column by cardinality")
+    parser.add_argument('--chunk-rows', type=int, help="bounded-memory mode, the logsheets are filtered, controlled and transformed in chunks of this many rows (rules run serially)")
+    parser.add_argument('--rule-timeout', type=float, default=600, help="seconds a rule may spend on remote lookups, the values left are reported as not verified")
+    parser.add_argument('--time-budget', type=float, default=1800, help="seconds all rules of a crate may spend on remote lookups, counted from the start of the run")
+    parser.add_argument('--watch', action='store_true', help="keep running and control a habitat again whenever one of its raw logsheets is saved, with warm state (no issues are created)")
+    parser.add_argument('--interval', type=float, default=0.25, help="seconds between two polls of the raw logsheets in watch mode")
+    parser.add_argument('--summary', type=Path, default=Path("data-quality-control-summary.json"), help="aggregate summary written in batch mode")
+    args = parser.parse_args()
+    if args.chunk_rows and (args.incremental or args.columnar or args.raw_cache or args.compact):
+        parser.error("--chunk-rows cannot be combined with --incremental, --columnar, --raw-cache or --compact")
+    if args.watch and (args.batch or args.chunk_rows or args.incremental):
+        parser.error("--watch cannot be combined with --batch, --chunk-rows or --incremental")
+    if args.batch:  # a workspace mistyped is an error, rather than a crate silently left out of the batch
+        matches = {pattern: glob(pattern) for pattern in args.batch}
+        unmatched = [pattern for pattern, paths in matches.items() if not paths]
+        if unmatched:
+            parser.error(f"--batch: no workspace matches {', '.join(unmatched)}")
+    if args.columnar or args.raw_cache:
+        from .columnar import require_pyarrow
+
+        require_pyarrow()
+
+    if args.dev:
+        from dotenv import load_dotenv
+
+        assert Path(".env").exists(), ".env file is missing"
+        load_dotenv(override=True)
+
+    GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+    GITHUB_REPOSITORY = os.getenv("GITHUB_REPOSITORY")
+    WATER_LOGSHEET_URL = os.getenv("WATER_LOGSHEET_URL")
+    SEDIMENT_LOGSHEET_URL = os.getenv("SEDIMENT_LOGSHEET_URL")
+    HARD_LOGSHEET_URL = os.getenv("HARD_LOGSHEET_URL")
+    DATA_QUALITY_CONTROL_THRESHOLD_DATE = os.getenv("DATA_QUALITY_CONTROL_THRESHOLD_DATE")
+    DATA_QUALITY_CONTROL_ASSIGNEE = os.getenv("DATA_QUALITY_CONTROL_ASSIGNEE")
+
+    # the action modules are imported once the environment is complete, they read their urls from it
+    from py_data_rules.data_type import XSDDate
+    from .crate import run_batch, run_crate
+    from .notify import create_issue
+
+    msg = f"DATA_QUALITY_CONTROL_THRESHOLD_DATE `{DATA_QUALITY_CONTROL_THRESHOLD_DATE}` is not a valid date (expected format: YYYY-MM-DD)"
+    assert XSDDate().match(DATA_QUALITY_CONTROL_THRESHOLD_DATE), msg
+
+    if args.batch:  # no issues are created in batch mode
+        workspaces = sorted({path for paths in matches.values() for path in paths})
+        run_batch(
+            workspaces,
+            threshold_date=DATA_QUALITY_CONTROL_THRESHOLD_DATE,
+            summary_path=args.summary,
+            cache_path=args.cache_dir,
+            workers=args.workers,
+            incremental=args.incremental,
+            full_rebuild=args.full_rebuild,
+            rule_workers=args.rule_workers,
+            profile=args.profile,
+            columnar=args.columnar,
+            raw_cache=args.raw_cache,
+            chunk_rows=args.chunk_rows,
+            rule_timeout=args.rule_timeout,
+            time_budget=args.time_budget,
+            compact=args.compact,
+        )
+    elif args.watch:  # no issues are created in watch mode
+        import logging
+        from .watch import Watcher
+
+        console = logging.StreamHandler()
+        console.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        logging.getLogger("action.watch").addHandler(console)
+        logging.getLogger("action.watch").setLevel(logging.INFO)
+        Watcher(
+            os.getenv("GITHUB_WORKSPACE"),
+            sediment=SEDIMENT_LOGSHEET_URL,
+            water=WATER_LOGSHEET_URL,
+            threshold_date=DATA_QUALITY_CONTROL_THRESHOLD_DATE,
+            interval=args.interval,
+            rule_workers=args.rule_workers,
+            profile=args.profile,
+            columnar=args.columnar,
+            raw_cache=args.raw_cache,
+            rule_timeout=args.rule_timeout,
+            time_budget=args.time_budget,
+            compact=args.compact,
+        ).run()
     else:
-        raise AssertionError("invalid logsheet_url configuration")
-
-    # data quality control
-    data_model = generate_data_model(
-        logsheets_path=LOGSHEETS_FILTERED_PATH,
-        alias2basename=alias2basename,
-    )
-
-    rules = generate_rules(habitat=habitat)
-
-    RuleEngine(
-        data_model=data_model,
-        rules=rules,
-    ).execute(report_path=DQC_PATH / "dqc.csv")
-
-    # notify end user of new dqc report
-    create_report(
-        input_path=DQC_PATH / "dqc.csv",
-        output_path=DQC_PATH / "report.csv",
-    )
-
-    if not args.dev:
-        create_issue()
-
-    # data transformation
-    Pipeline(
-        input_path=LOGSHEETS_FILTERED_PATH,
-        output_path=LOGSHEETS_TRANSFORMED_PATH,
-        dqc_path=DQC_PATH / "dqc.csv",
-        alias2basename=alias2basename,
-    ).run()
+        run_crate(
+            os.getenv("GITHUB_WORKSPACE"),
+            sediment=SEDIMENT_LOGSHEET_URL,
+            water=WATER_LOGSHEET_URL,
+            threshold_date=DATA_QUALITY_CONTROL_THRESHOLD_DATE,
+            notify=None if args.dev else lambda changes: create_issue(
+                GITHUB_TOKEN,
+                GITHUB_REPOSITORY,
+                DATA_QUALITY_CONTROL_THRESHOLD_DATE,
+                DATA_QUALITY_CONTROL_ASSIGNEE,
+                changes,
+            ),
+            incremental=args.incremental,
+            full_rebuild=args.full_rebuild,
+            rule_workers=args.rule_workers,
+            profile=args.profile,
+            columnar=args.columnar,
+            raw_cache=args.raw_cache,
+            chunk_rows=args.chunk_rows,
+            rule_timeout=args.rule_timeout,
+            time_budget=args.time_budget,
+            compact=args.compact,
+        )
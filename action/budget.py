@@ -0,0 +1,81 @@
+"""
+time budgets of the rules, network lookups stop at the deadline of the rule they run for
+"""
+import logging
+import time
+from contextvars import ContextVar
+from functools import wraps
+from py_data_rules.data_model import DataModel
+from .violations import ViolationBatch
+
+logger = logging.getLogger(__name__)
+
+INCOMPLETE = "incomplete control"  # diagnosis of the values left unverified when a budget ran out
+
+current_deadline = ContextVar("current_deadline", default=None)  # time.monotonic() at which lookups stop
+
+
+def remaining(timeout=None):
+    """
+    seconds left before the deadline of the current rule, capped at the given timeout, 0 once it has passed
+    """
+    deadline = current_deadline.get()
+    if deadline is None:
+        return timeout
+    left = max(0.0, deadline - time.monotonic())
+    return left if timeout is None else min(timeout, left)
+
+
+def expired():
+    deadline = current_deadline.get()
+    return deadline is not None and time.monotonic() >= deadline
+
+
+def unverified(table, column, rows, values, what):
+    """
+    a single violation for the values of a column that were not verified, pointing at the first of them
+    """
+    more = f", nor {len(rows) - 1} more values of {column}" if len(rows) > 1 else ""
+    return ViolationBatch(
+        diagnosis=INCOMPLETE,
+        table=table,
+        column=column,
+        row=[rows[0]],
+        value=[values[0]],
+        extended_diagnosis=f"{what} could not be verified within the time budget{more}",
+    )
+
+
+class TimeBudget:
+    """
+    every rule gets rule_seconds from the moment it starts, all rules together get total_seconds from the start
+    of the run, the rules that could not look up all their values in time are reported as incomplete
+    """
+    def __init__(self, rule_seconds=None, total_seconds=None):
+        self.rule_seconds = rule_seconds
+        self.deadline = time.monotonic() + total_seconds if total_seconds else None
+        self.incomplete = set()  # names of the rules that ran out of time
+
+    def wrap(self, fn, name):
+        @wraps(fn)
+        def wrapper(data_model: DataModel) -> ViolationBatch:
+            deadlines = [self.deadline]
+            if self.rule_seconds:
+                deadlines.append(time.monotonic() + self.rule_seconds)
+            deadlines = [deadline for deadline in deadlines if deadline is not None]
+            token = current_deadline.set(min(deadlines) if deadlines else None)
+            try:
+                result = fn(data_model)
+            finally:
+                current_deadline.reset(token)
+            if (result.field("diagnosis") == INCOMPLETE).any():
+                self.incomplete.add(name)
+                logger.warning(f"{name} ran out of its time budget, its control is incomplete")
+            return result
+        return wrapper
+
+    def log_summary(self):
+        if self.incomplete:
+            logger.warning(
+                "the data quality control is incomplete, rules out of time: " + ", ".join(sorted(self.incomplete))
+            )
@@ -0,0 +1,61 @@
+"""
+persistent caches of remote lookups, stored next to the data quality control output
+"""
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class LookupCache:
+    """
+    json-backed key/value store with a time-to-live and a bounded number of entries
+    """
+    def __init__(self, path, ttl=30 * 24 * 3600, max_entries=10000):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = self._load()  # key -> [value, timestamp]
+
+    def _load(self):
+        if self.path.exists():
+            try:
+                return json.loads(self.path.read_text(encoding="utf-8"))
+            except (ValueError, OSError):
+                logger.warning(f"discarding unreadable cache {self.path}")
+        return {}
+
+    def _expired(self, timestamp):
+        return time.time() - timestamp > self.ttl
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None or self._expired(entry[1]):
+            return None
+        return entry[0]
+
+    def update(self, mapping):
+        now = time.time()
+        for key, value in mapping.items():
+            self.entries[key] = [value, now]
+
+    def save(self):
+        entries = self._load()  # merge with entries saved in the meantime, e.g. by other crates of a batch
+        for key, entry in self.entries.items():
+            if key not in entries or entries[key][1] < entry[1]:
+                entries[key] = entry
+        entries = {k: v for k, v in entries.items() if not self._expired(v[1])}
+        if len(entries) > self.max_entries:  # evict the oldest entries first
+            newest = sorted(entries.items(), key=lambda item: item[1][1])[-self.max_entries:]
+            entries = dict(newest)
+        self.entries = entries
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(self.entries), encoding="utf-8")
+        os.replace(tmp_path, self.path)
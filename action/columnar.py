@@ -0,0 +1,112 @@
+"""
+columnar (parquet) sidecars of the csv outputs and a parquet cache of the raw logsheets
+"""
+import hashlib
+import logging
+import os
+import time
+from functools import wraps
+from pathlib import Path
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+VIOLATION_COLUMNS = {  # column -> arrow type, the schema of dqc.parquet
+    "table": "string",
+    "column": "string",
+    "row": "int64",
+    "value": "string",
+    "diagnosis": "string",
+    "extended_diagnosis": "string",
+    "repair": "string",
+    "file_path": "string",
+    "data_type": "string",
+    "nullable": "bool",
+}
+
+
+def require_pyarrow():
+    """
+    pyarrow is an optional dependency, only imported for the columnar outputs and the raw cache
+    """
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ImportError("pyarrow is required for the columnar outputs and the raw cache (pip install pyarrow)") from None
+
+
+def file_hash(path):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(2**20), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def write_parquet(table, path):
+    import pyarrow.parquet as pq
+
+    tmp_path = Path(path).with_suffix(f".{os.getpid()}.tmp")
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def write_logsheet(df, path):
+    """
+    parquet sidecar of a logsheet, every column is a string column like in the csv
+    """
+    require_pyarrow()
+    import pyarrow as pa
+
+    schema = pa.schema([(str(column), pa.string()) for column in df.columns])
+    write_parquet(pa.Table.from_pandas(df.astype(object), schema=schema, preserve_index=False), path)
+
+
+def write_violations(csv_path, path):
+    """
+    parquet sidecar of dqc.csv with a fixed schema, the values are kept as the strings they were written as
+    """
+    require_pyarrow()
+    import pyarrow as pa
+
+    df = pd.read_csv(csv_path, dtype=str, keep_default_na=False, na_values=[""])
+    df = df.reindex(columns=list(VIOLATION_COLUMNS))
+    df["row"] = pd.to_numeric(df["row"]).astype("Int64")
+    df["nullable"] = df["nullable"].map({"True": True, "False": False}).astype("boolean")
+    schema = pa.schema([(column, pa.type_for_alias(type_)) for column, type_ in VIOLATION_COLUMNS.items()])
+    write_parquet(pa.Table.from_pandas(df, schema=schema, preserve_index=False), path)
+
+
+class RawCache:
+    """
+    parquet copies of raw logsheets keyed by the hash of the csv, unchanged logsheets are not parsed again,
+    entries unused for longer than the ttl are removed
+    """
+    def __init__(self, path, ttl=30 * 24 * 3600):
+        require_pyarrow()
+        self.path = Path(path)
+        self.ttl = ttl
+
+    def reader(self, fallback):
+        @wraps(fallback)
+        def reader(path):
+            parquet_path = self.path / f"{file_hash(path)}.parquet"
+            if parquet_path.exists():
+                os.utime(parquet_path)  # marks the entry as used
+                return pd.read_parquet(parquet_path)
+            import pyarrow as pa
+
+            df = fallback(path)
+            self.path.mkdir(parents=True, exist_ok=True)
+            write_parquet(pa.Table.from_pandas(df), parquet_path)
+            return df
+        return reader
+
+    def prune(self):
+        now = time.time()
+        for parquet_path in self.path.glob("*.parquet"):
+            try:
+                if now - parquet_path.stat().st_mtime > self.ttl:
+                    parquet_path.unlink()
+            except FileNotFoundError:  # removed by another crate of a batch
+                pass
@@ -0,0 +1,42 @@
+"""
+compact in-memory logsheets, repetitive columns as categoricals and the other columns interned
+"""
+import sys
+import pandas as pd
+
+CATEGORY_RATIO = 0.5  # columns with at most this share of distinct values become categoricals
+
+
+def frame_bytes(df):
+    """
+    memory held by a frame of strings, every distinct string object is counted once per column
+    """
+    total = df.index.memory_usage()
+    for i in range(df.shape[1]):
+        column = df.iloc[:, i]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            total += column.cat.codes.nbytes + sum(sys.getsizeof(value) for value in column.cat.categories)
+        else:
+            values = column.to_numpy()
+            total += values.nbytes
+            if values.dtype == object:
+                total += sum(sys.getsizeof(value) for value in {id(value): value for value in values}.values())
+    return total
+
+
+def compact_frame(df, pool=None, ratio=CATEGORY_RATIO):
+    """
+    the string columns of a frame as categoricals when they are repetitive, interned through the pool otherwise,
+    the values are unchanged and the frame writes the same csv
+    """
+    pool = {} if pool is None else pool
+    df = df.copy(deep=False)
+    for i in range(df.shape[1]):
+        column = df.iloc[:, i]
+        if column.dtype != object:
+            continue
+        if column.nunique(dropna=False) <= ratio * len(column):
+            df.isetitem(i, column.astype("category"))
+        else:
+            df.isetitem(i, pd.Series([pool.setdefault(value, value) for value in column.to_numpy()], index=column.index, dtype=object))
+    return df
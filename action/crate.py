@@ -0,0 +1,353 @@
+"""
+filter, control, report and transform the logsheets of observatory crates
+"""
+import json
+import logging
+import pandas as pd
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from py_data_rules.rule_engine import RuleEngine
+from .data_model import fetch_schema_config, generate_data_model, generate_schema_columns, prime_data_types
+from .budget import TimeBudget
+from .columnar import RawCache, write_violations
+from .dates import DateCache
+from .extensions import normalize_emobon_frame, read_raw_csv
+from .incremental import IncrementalState
+from .metrics import Metrics
+from .notify import ReportChanges, ReportDigest
+from .pipeline import Pipeline
+from .report import ViolationSink
+from .rules import generate_rules
+from .scheduler import RuleScheduler
+from .store import TableStore
+from .streaming import ChunkedControl
+from .violations import ViolationBuffer
+
+logger = logging.getLogger(__name__)
+
+ALIAS2BASENAME_SEDIMENT = {
+    "sm": "sediment_measured",
+    "so": "sediment_observatory",
+    "ss": "sediment_sampling",
+}
+ALIAS2BASENAME_WATER = {
+    "wm": "water_measured",
+    "wo": "water_observatory",
+    "ws": "water_sampling",
+}
+
+
+class Crate:
+    """
+    paths of an observatory crate workspace
+    """
+    def __init__(self, workspace):
+        self.workspace = Path(workspace)
+        self.logsheets_path = self.workspace / "logsheets/raw"
+        self.logsheets_filtered_path = self.workspace / "logsheets/filtered"
+        self.logsheets_transformed_path = self.workspace / "logsheets/transformed"
+        self.dqc_path = self.workspace / "data-quality-control"
+
+    def mkdirs(self):
+        for path in (self.logsheets_filtered_path, self.logsheets_transformed_path, self.dqc_path):
+            path.mkdir(parents=True, exist_ok=True)
+
+
+def select_habitat(sediment, water):
+    if sediment and water:
+        return "all", {**ALIAS2BASENAME_SEDIMENT, **ALIAS2BASENAME_WATER}
+    elif sediment:
+        return "sediment", ALIAS2BASENAME_SEDIMENT
+    elif water:
+        return "water", ALIAS2BASENAME_WATER
+    else:
+        raise AssertionError("invalid logsheet_url configuration")
+
+
+def filter_logsheets(
+    crate, habitat, threshold_date, store=None, reader=read_raw_csv, dates=None
+):  # i.e. discarding samples and measurements taken after the data_quality_control_threshold_date
+    df_sampling = reader(crate.logsheets_path / f"{habitat}_sampling.csv")
+    normalized = normalize_emobon_frame(df_sampling)  # as the schema check reads it, sharing the parsed dates
+    dates = dates if dates is not None else DateCache()
+    collection_date, failed = dates.parse(f"{habitat[0]}s", "collection_date", normalized["collection_date"])
+    if failed.any():  # not all canonical dates, parsed by pandas like before
+        after = (pd.to_datetime(normalized["collection_date"]) >= threshold_date).to_numpy()
+    else:
+        after = collection_date >= pd.Timestamp(threshold_date).to_datetime64()
+    dates.keep(f"{habitat[0]}s", "collection_date", ~after)
+    df_sampling.loc[normalized.index[after]] = ""
+    df_sampling.to_csv(crate.logsheets_filtered_path / f"{habitat}_sampling.csv", index=False)
+
+    df_measured = reader(crate.logsheets_path / f"{habitat}_measured.csv")
+    df_measured.loc[
+        ~df_measured["source_mat_id"].isin(df_sampling["source_mat_id"])
+    ] = ""
+    df_measured.to_csv(crate.logsheets_filtered_path / f"{habitat}_measured.csv", index=False)
+
+    df_observatory = reader(crate.logsheets_path / f"{habitat}_observatory.csv")
+    df_observatory.to_csv(
+        crate.logsheets_filtered_path / f"{habitat}_observatory.csv", index=False
+    )
+
+    if store is not None:  # later stages are served from memory rather than from the filtered files
+        store[f"{habitat}_sampling"] = normalized[~after]
+        store[f"{habitat}_measured"] = normalize_emobon_frame(df_measured)
+        store[f"{habitat}_observatory"] = normalize_emobon_frame(df_observatory)
+    return len(df_sampling) + len(df_measured) + len(df_observatory)
+
+
+def create_reports(violations, dqc_path, report_path, others=()):
+    """
+    report.csv of the violations in the dqc.csv the engine wrote, in a single pass,
+    others: buffers of earlier runs to include in both, they are appended to dqc.csv
+    """
+    violations.read_dqc(dqc_path)
+    with ViolationSink(report_path, dqc_path=dqc_path if others else None, append=True) as sink:
+        sink.consume_buffer(violations, written=True)
+        for buffer in others:
+            sink.consume_buffer(buffer)
+    return sink
+
+
+def run_crate(
+    workspace,
+    sediment,
+    water,
+    threshold_date,
+    notify=None,
+    incremental=False,
+    full_rebuild=False,
+    rule_workers=4,
+    profile=False,
+    cache_path=None,
+    schema_config=None,
+    columnar=False,
+    raw_cache=False,
+    chunk_rows=None,
+    rule_timeout=None,
+    time_budget=None,
+    compact=False,
+    warm=None,
+):
+    """
+    filter, control, report and transform the logsheets of a single crate,
+    remote lookups stop after rule_timeout seconds per rule and time_budget seconds from the start of the run,
+    notify is called with the changes since the previous report, unless there are none,
+    warm: state kept across runs (see action/watch.py), the violations of the other habitat are kept in the report
+    """
+    start = time.perf_counter()
+    budget = TimeBudget(rule_seconds=rule_timeout, total_seconds=time_budget)
+    crate = Crate(workspace)
+    crate.mkdirs()
+    cache_path = cache_path or crate.dqc_path / "cache"
+    metrics = Metrics()
+    store = TableStore(compact=compact)
+    # date columns parsed once, for the filter, the schema types and the date ordering rules
+    dates = warm.dates if warm is not None else DateCache()
+    previous = ReportDigest.read(crate.dqc_path / "report.csv") if notify is not None else None  # before it is overwritten
+
+    handler = logging.FileHandler(crate.dqc_path / "logfile", mode="w")
+    handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    root_logger = logging.getLogger()
+    root_logger.addHandler(handler)
+    root_logger.setLevel(logging.INFO)
+    if profile:  # the profiler only sees the thread it was enabled on, the rules run serially
+        import cProfile
+
+        rule_workers = 1
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        habitat, alias2basename = select_habitat(sediment, water)
+        if warm is not None:
+            schema_config = warm.schema_config
+        if schema_config is None:
+            with metrics.stage("fetch_schema_config"):
+                schema_config = fetch_schema_config(cache_path)
+
+        if chunk_rows:  # bounded memory, the logsheets are filtered, controlled and transformed chunk by chunk
+            with metrics.stage("ChunkedControl.run") as record, ViolationSink(
+                crate.dqc_path / "report.csv", dqc_path=crate.dqc_path / "dqc.csv"
+            ) as sink:
+                ChunkedControl(
+                    crate,
+                    habitat=habitat,
+                    alias2basename=alias2basename,
+                    threshold_date=threshold_date,
+                    schema_config=schema_config,
+                    cache_path=cache_path,
+                    chunk_rows=chunk_rows,
+                    sink=sink,
+                    wrappers=[budget.wrap],
+                ).run()
+                record["violations"] = sink.rows
+                record["report_rows"] = sink.report_rows
+        else:
+            if raw_cache:
+                raw_cache = RawCache(cache_path / "raw")
+                reader = raw_cache.reader(read_raw_csv)
+            else:
+                reader = read_raw_csv
+            for name, selected in (("sediment", sediment), ("water", water)):
+                if selected:
+                    with metrics.stage(f"filter_logsheets {name}") as record:
+                        record["rows"] = filter_logsheets(crate, name, threshold_date, store, reader, dates)
+            if raw_cache:
+                raw_cache.prune()
+            store.log_memory()
+
+            # data quality control
+            with metrics.stage("generate_data_model"):
+                # the data types of the schemas, primed with the values of the logsheets before the engine runs
+                columns = warm.columns if warm is not None else generate_schema_columns(schema_config)
+                data_model = generate_data_model(
+                    logsheets_path=crate.logsheets_filtered_path,
+                    alias2basename=alias2basename,
+                    reader=metrics.timed_reader(store.reader()),
+                    columns=columns,
+                    schemas=warm.schemas if warm is not None else None,
+                )
+
+            if incremental:
+                incremental = IncrementalState(
+                    crate.dqc_path / "manifest.json",
+                    aliases=alias2basename.keys(),
+                    full_rebuild=full_rebuild,
+                )
+                wrappers = [budget.wrap, incremental.wrap, metrics.wrap]
+            else:
+                wrappers = [budget.wrap, metrics.wrap]
+
+            if rule_workers > 1:
+                scheduler = RuleScheduler(aliases=alias2basename.keys(), workers=rule_workers)
+                wrappers.append(scheduler.wrap)
+
+            violations = ViolationBuffer()  # for the report and the data transformation
+            rules = generate_rules(
+                habitat=habitat,
+                cache_path=cache_path,
+                violations=violations,
+                wrappers=wrappers,
+                dates=dates,
+                rule_arrays=warm.rule_arrays(habitat, cache_path) if warm is not None else None,
+            )
+
+            with metrics.stage("RuleEngine.execute") as record:
+                prime_data_types(data_model, alias2basename, columns, dates)
+                try:
+                    RuleEngine(
+                        data_model=data_model,
+                        rules=rules,
+                    ).execute(report_path=crate.dqc_path / "dqc.csv")
+                finally:
+                    if rule_workers > 1:
+                        scheduler.shutdown()
+                record["violations"] = len(violations)
+
+            if incremental:
+                incremental.save()
+
+        # notify end user of new dqc report
+        if not chunk_rows:  # the chunks are reported as they are controlled
+            with metrics.stage("create_report") as record:
+                sink = create_reports(
+                    violations,
+                    dqc_path=crate.dqc_path / "dqc.csv",
+                    report_path=crate.dqc_path / "report.csv",
+                    others=warm.other_violations(violations, habitat) if warm is not None else (),
+                )
+                record["report_rows"] = sink.report_rows
+        sink.save_counts(crate.dqc_path / "counts.json")
+        sink.log_summary()
+        budget.log_summary()
+        if columnar:
+            with metrics.stage("write_violations"):
+                write_violations(crate.dqc_path / "dqc.csv", crate.dqc_path / "dqc.parquet")
+
+        if notify is not None:
+            changes = ReportChanges(previous, ReportDigest.read(crate.dqc_path / "report.csv"))
+            if changes.unchanged:
+                logger.info("the report is unchanged since the previous run, the end user is not notified")
+            else:
+                with metrics.stage("create_issue"):
+                    notify(changes)
+
+        # data transformation
+        if not chunk_rows:
+            with metrics.stage("Pipeline.run"):
+                Pipeline(
+                    input_path=crate.logsheets_filtered_path,
+                    output_path=crate.logsheets_transformed_path,
+                    violations=violations,
+                    alias2basename=alias2basename,
+                    reader=store.reader(),
+                    columnar=columnar,
+                ).run()
+    finally:
+        if profile:
+            profiler.disable()
+            profiler.dump_stats(crate.dqc_path / "profile.pstats")
+        metrics.save(crate.dqc_path / "metrics.json")
+        metrics.log_summary()
+        root_logger.removeHandler(handler)
+        handler.close()
+
+    return {
+        "workspace": str(crate.workspace),
+        "habitat": habitat,
+        "report_rows": sink.report_rows,
+        "incomplete": sorted(budget.incomplete),
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def run_batch_crate(workspace, threshold_date, **options):
+    """
+    run_crate for a batch, the habitats follow from the raw logsheets present and failures are summarized
+    """
+    logsheets_path = Crate(workspace).logsheets_path
+    try:
+        return {
+            "status": "ok",
+            **run_crate(
+                workspace,
+                sediment=(logsheets_path / "sediment_sampling.csv").exists(),
+                water=(logsheets_path / "water_sampling.csv").exists(),
+                threshold_date=threshold_date,
+                **options,
+            ),
+        }
+    except Exception as e:
+        return {"workspace": str(workspace), "status": "failed", "error": repr(e)}
+
+
+def run_batch(workspaces, threshold_date, summary_path, cache_path, workers=None, **options):
+    """
+    run a batch of crates in a process pool, the logsheet schema and the lookup caches are shared
+    """
+    cache_path.mkdir(parents=True, exist_ok=True)
+    schema_config = fetch_schema_config(cache_path)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                run_batch_crate,
+                workspace,
+                threshold_date,
+                cache_path=cache_path,
+                schema_config=schema_config,
+                **options,
+            )
+            for workspace in workspaces
+        ]
+        crates = [future.result() for future in futures]
+    summary = {
+        "threshold_date": threshold_date,
+        "crates": crates,
+        "failed": sum(crate["status"] != "ok" for crate in crates),
+        "report_rows": sum(crate.get("report_rows", 0) for crate in crates),
+    }
+    Path(summary_path).write_text(json.dumps(summary, indent=2))
+    return summary
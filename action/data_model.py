@@ -1,106 +1,185 @@
+import hashlib
+import json
+import logging
+import os
+import time
+import numpy as np
 import pandas as pd
 from py_data_rules.data_model import DataModel
-from py_data_rules.data_type import (
-    DataType,
-    XSDBoolean,
-    XSDDate,
-    XSDDateTime,
-    XSDFloat,
-    XSDDouble,
-    XSDInteger,
-    XSDString,
-    XSDAnyURI,
-)
+from py_data_rules.data_type import XSDBoolean, XSDString, XSDAnyURI
 from py_data_rules.schema import Schema
+from .extensions import (
+    BatchMatch,
+    BatchXSDDate,
+    BatchXSDDateTime,
+    BatchXSDDouble,
+    BatchXSDFloat,
+    BatchXSDInteger,
+    EMOBONList,
+    EMOBONRange,
+    read_emobon_csv,
+)
+from .metrics import count_http
 
+logger = logging.getLogger(__name__)
 
-class EMOBONRange(DataType):
-    @staticmethod
-    def match(instance):
-        assert instance
-        try:
-            a, b = map(str.strip, instance.split("-"))
-            assert float(a) < float(b)
-            return True
-        except (ValueError, AssertionError):
-            return False
-
-
-class EMOBONList(DataType):
-    @staticmethod
-    def match(instance):
-        assert instance
-        if "," in instance:  # list must not contain commas
-            return False
-        else:
-            return True
+LOGSHEET_SCHEMA_URL = os.getenv(
+    "LOGSHEET_SCHEMA_URL",
+    "https://raw.githubusercontent.com/emo-bon/observatory-profile/main/logsheet_schema_extended.csv",
+)
+HABITATS = ["s", "w"]
+SHEETS = ["measured", "observatory", "sampling"]
 
 
-def read_emobon_csv(path):
-    df = (
-        pd.read_csv(path, dtype=object, keep_default_na=False, na_values=[""])
-        .astype(str)
-        .map(lambda _: _.strip())
-        .map(lambda _: "" if _ == "nan" else _)
-        .map(lambda _: "" if (_ == "NA") or (_ =="ΝΑ") else _)  # prevent unicode confusion by replacing both greek and latin NA)
-    )
-    df = df[~(df == "").all(axis=1)]  # drop empty rows
-    return df
+def fetch_schema_config(cache_path=None, max_age=3600, timeout=10):
+    """
+    read the logsheet schema, a cached copy is revalidated by etag at most every max_age seconds
+    and serves as offline fallback when the download fails
+    """
+    if cache_path is None:
+        return pd.read_csv(LOGSHEET_SCHEMA_URL).astype(str)
+    csv_path = cache_path / "logsheet_schema_extended.csv"
+    meta_path = cache_path / "logsheet_schema_extended.json"
+    meta = json.loads(meta_path.read_text()) if csv_path.exists() and meta_path.exists() else {}
+    if meta and time.time() - meta["checked"] < max_age:
+        logger.info("logsheet schema was revalidated recently, using the cached copy")
+    else:
+        import requests  # not needed when the cached copy was revalidated recently
+
+        headers = {"If-None-Match": meta["etag"]} if meta.get("etag") else {}
+        try:
+            r = requests.get(
+                LOGSHEET_SCHEMA_URL, headers=headers, timeout=timeout, hooks={"response": count_http}
+            )
+            if r.status_code == 304:
+                logger.info("logsheet schema is unchanged, using the cached copy")
+            else:
+                r.raise_for_status()
+                sha256 = hashlib.sha256(r.content).hexdigest()
+                if sha256 != meta.get("sha256"):
+                    cache_path.mkdir(parents=True, exist_ok=True)
+                    csv_path.write_bytes(r.content)
+                meta = {"etag": r.headers.get("ETag"), "sha256": sha256}
+            meta["checked"] = time.time()
+            meta_path.write_text(json.dumps(meta))
+        except requests.RequestException:
+            if not meta:
+                raise
+            logger.warning("logsheet schema could not be revalidated, using the cached copy")
+    return pd.read_csv(csv_path).astype(str)
 
 
-def generate_schema(habitat, sheet, config):
+def generate_schema_columns(config):
+    """
+    (habitat, sheet) -> columns (label, data type, nullable) of all pairs, in a single pass over the config
+    """
     dtype_lookup = {
         "xsd:string": XSDString(),
-        "xsd:float": XSDFloat(),
-        "xsd:double": XSDDouble(),
-        "xsd:integer": XSDInteger(),
-        "xsd:datetime": XSDDateTime(["%Y-%m-%dT%H:%M", "%Y-%m-%dT%H:%M%z"]),
-        "xsd:date": XSDDate(),
+        "xsd:float": BatchXSDFloat(),
+        "xsd:double": BatchXSDDouble(),
+        "xsd:integer": BatchXSDInteger(),
+        "xsd:datetime": BatchXSDDateTime(["%Y-%m-%dT%H:%M", "%Y-%m-%dT%H:%M%z"]),
+        "xsd:date": BatchXSDDate(),
         "xsd:boolean": XSDBoolean(),
         "range": EMOBONRange(),
         "xsd:list": EMOBONList(),
     }
-    schema = Schema()
-    for _, row in config.iterrows():
-        lty = row["LogsheetType"].lower().strip()
-        lta = row["LogsheetTab"].lower().strip()
-        lct = row["LogsheetColumnTitle"].strip()
-        dty = row["DataTypeOut"].lower().strip()
-        req = row["Requirement"].lower().strip()
-        base_uri = row["BaseURI"].lower().strip()
-        dty = "xsd:float" if dty == "xd:float" else dty
+    columns = {(habitat, sheet): [] for habitat in HABITATS for sheet in SHEETS}
+    config = pd.DataFrame(
+        {
+            "lty": config["LogsheetType"].str.lower().str.strip(),
+            "lta": config["LogsheetTab"].str.lower().str.strip(),
+            "lct": config["LogsheetColumnTitle"].str.strip(),
+            "dty": config["DataTypeOut"].str.lower().str.strip().replace("xd:float", "xsd:float"),
+            "req": config["Requirement"].str.lower().str.strip(),
+            "base_uri": config["BaseURI"].str.lower().str.strip(),
+        }
+    )
+    for lty, lta, lct, dty, req, base_uri in config.itertuples(index=False):
         if dty == "xsd:anyuri":
             data_type = XSDAnyURI(base_uri=base_uri)
         else:
             data_type = dtype_lookup[dty]
-        if habitat == "w" and sheet == "measured" and lct == "ph":
-            req = "optional"
-        if (habitat in lty) and (sheet in lta):
-            schema.add_column(
-                label=lct,
-                data_type=data_type,
-                nullable=(req == "optional"),
-                trim="both",
-            )
+        for habitat, sheet in columns:
+            if (habitat in lty) and (sheet in lta):
+                optional = (req == "optional") or (habitat == "w" and sheet == "measured" and lct == "ph")
+                columns[(habitat, sheet)].append((lct, data_type, optional))
+    return columns
+
+
+def build_schema(columns):
+    schema = Schema()
+    for label, data_type, nullable in columns:
+        schema.add_column(
+            label=label,
+            data_type=data_type,
+            nullable=nullable,
+            trim="both",
+        )
     return schema
 
 
-def generate_data_model(logsheets_path, alias2basename):
-    config = pd.read_csv(
-        "https://raw.githubusercontent.com/emo-bon/observatory-profile/main/logsheet_schema_extended.csv"
-    ).astype(str)
+def generate_schemas(config):
+    """
+    build the schemas of all (habitat, sheet) pairs in a single pass over the config
+    """
+    return {key: build_schema(columns) for key, columns in generate_schema_columns(config).items()}
+
+
+def generate_schema(habitat, sheet, config):
+    return generate_schemas(config)[(habitat, sheet)]
+
+
+def schema_key(base_name):
+    """
+    (habitat, sheet) of a logsheet, e.g. ("w", "sampling") of water_sampling
+    """
+    return base_name[0], base_name.split("_")[1]
+
+
+def prime_data_types(data_model, alias2basename, columns, dates):
+    """
+    match the columns of the logsheets against their data types in one go, ahead of the schema validation of the
+    engine, which is then served cell by cell from the results, date columns are parsed through the cache
+    """
+    for alias, base_name in alias2basename.items():
+        df = data_model[alias]
+        for label, data_type, _ in columns[schema_key(base_name)]:
+            if isinstance(data_type, BatchMatch) and label in df.columns:
+                if isinstance(data_type, BatchXSDDate):
+                    parsed, _ = dates.parse(alias, label, df[label])
+                    data_type.prime(df[label], matched=~np.isnat(parsed))
+                else:
+                    data_type.prime(df[label])
+
+
+def generate_data_model(
+    logsheets_path,
+    alias2basename,
+    cache_path=None,
+    schema_config=None,
+    reader=read_emobon_csv,
+    columns=None,
+    schemas=None,
+):
+    """
+    columns and schemas: those generated for an earlier run to reuse, e.g. with the matches of their data types,
+    see prime_data_types
+    """
+    if columns is None:
+        if schema_config is None:
+            schema_config = fetch_schema_config(cache_path)
+        columns = generate_schema_columns(schema_config)
     data_model = {}
     for alias, base_name in alias2basename.items():
-        habitat = base_name[0]
-        sheet = base_name.split("_")[1]
+        key = schema_key(base_name)
         logsheet_path = logsheets_path / f"{base_name}.csv"
-        schema = generate_schema(habitat, sheet, config)
         data_model.update(
             {
                 alias: {
                     "path": logsheet_path,
-                    "reader": read_emobon_csv,
-                    "schema": schema,
+                    "reader": reader,
+                    "schema": schemas[key] if schemas else build_schema(columns[key]),
                 }
             }
         )
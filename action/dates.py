@@ -0,0 +1,46 @@
+"""
+per-run cache of parsed date columns, shared by the filter, the schema types and the date ordering rules
+"""
+import threading
+import numpy as np
+import pandas as pd
+
+
+class DateCache:
+    """
+    (table, column) -> the column parsed once into a datetime64 array (NaT where missing or not a date),
+    an entry is reused as long as the values it was parsed from are unchanged
+    """
+    def __init__(self):
+        self.columns = {}  # (table, column) -> (values, dates, failed)
+        self.lock = threading.Lock()
+
+    def parse(self, table, column, values):
+        """
+        datetime64 array and parse-failure mask of a column of strings, only canonical dates (YYYY-MM-DD) parse,
+        missing values (empty or NaN) are NaT but do not count as failures
+        """
+        key = (table, column)
+        raw = values.to_numpy(dtype=object)
+        with self.lock:
+            cached = self.columns.get(key)
+        if cached is not None and len(cached[0]) == len(raw) and (cached[0] == raw).all():
+            return cached[1], cached[2]
+        missing = pd.isna(raw) | (raw == "")
+        dates = pd.to_datetime(values, format="%Y-%m-%d", errors="coerce").to_numpy(dtype="datetime64[ns]")
+        # the format also accepts single-digit months and days and non-ascii digits, canonical dates survive a round trip
+        dates[np.datetime_as_string(dates, unit="D").astype(object) != raw] = np.datetime64("NaT")
+        failed = ~missing & np.isnat(dates)
+        with self.lock:
+            self.columns[key] = (raw, dates, failed)
+        return dates, failed
+
+    def keep(self, table, column, mask):
+        """
+        narrow the entry of a column to the rows of the mask, e.g. those a filter keeps, the column is then served
+        from the cache once read again filtered
+        """
+        key = (table, column)
+        with self.lock:
+            raw, dates, failed = self.columns[key]
+            self.columns[key] = (raw[mask], dates[mask], failed[mask])
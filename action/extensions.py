@@ -1,35 +1,162 @@
 """
 emobon-specific extensions of existing functionality
 """
+import logging
+import time
+import numpy as np
 import pandas as pd
-from py_data_rules.data_type import DataType
+from pathlib import Path
+from py_data_rules.data_type import DataType, XSDDate, XSDDateTime, XSDDouble, XSDFloat, XSDInteger
+
+logger = logging.getLogger(__name__)
+
+# cell values that are read as empty, both greek and latin NA are listed to prevent unicode confusion
+NA_LITERALS = ["nan", "NA", "ΝΑ"]
+
+# canonical lexical forms, matched by every implementation of the type, anything else is left to match()
+FLOAT_PATTERN = r"[+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?"
+INTEGER_PATTERN = r"[+-]?[0-9]+"
+DATE_PATTERN = r"[0-9]{4}-[0-9]{2}-[0-9]{2}"
+DATETIME_PATTERN = r"[0-9]{4}-[0-9]{2}-[0-9]{2}T[0-9]{2}:[0-9]{2}"
+
+MAX_MATCHES = 100000  # values memoized per data type, beyond those of the column matched last
+
+
+def normalize_emobon_frame(df):
+    """
+    strip every cell, blank out the NA literals and drop empty rows in one column-wise pass
+    """
+    df = df.fillna("").apply(lambda column: column.str.strip())
+    df = df.mask(df.isin(NA_LITERALS), "")
+    df = df[~(df == "").all(axis=1)]  # drop empty rows
+    return df
+
+
+def read_raw_csv(path):
+    return pd.read_csv(path, dtype=object, keep_default_na=False)
 
 
 def read_emobon_csv(path):
-    df = (
-        pd.read_csv(path, dtype=object, keep_default_na=False)
-        .astype(str)
-        .map(lambda _: _.strip())
-        .map(lambda _: "" if _ == "nan" else _)
-        .map(lambda _: "" if (_ == "NA") or (_ =="ΝΑ") else _)  # prevent unicode confusion by replacing both greek and latin NA)
+    start = time.perf_counter()
+    df = normalize_emobon_frame(
+        pd.read_csv(path, dtype=object, keep_default_na=False, na_values=[""])
     )
-    df = df[~(df == "").all(axis=1)]  # drop empty rows
+    logger.info(f"read {Path(path).name} ({len(df)} rows) in {time.perf_counter() - start:.3f}s")
     return df
 
 
-class EMOBONList(DataType):
+def to_float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return np.nan
+
+
+def to_floats(series):
+    """
+    column-wise float(value), NaN where float() fails
+    canonical numbers are converted without a python call, anything else float() accepts falls back to to_float
+    """
+    canonical = series.str.fullmatch(FLOAT_PATTERN).to_numpy(dtype=bool)
+    result = np.full(len(series), np.nan)
+    result[canonical] = series[canonical].to_numpy().astype(float)
+    rest = series[~canonical]
+    if len(rest):
+        result[~canonical] = [to_float(value) for value in rest]
+    return pd.Series(result, index=series.index)
+
+
+class BatchMatch:
+    """
+    data type that also matches a whole column at once, match_series returns a boolean mask,
+    match of a single (non-empty) cell is served from the values matched so far,
+    at most max_matches of them are kept besides those of the column primed last (e.g. over the runs of a watch)
+    """
+    max_matches = MAX_MATCHES
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.matches = {}  # value -> whether it matches, in the order they were matched
+
+    def match_one(self, instance):
+        return super().match(instance)
+
+    def fast_match(self, values):
+        """
+        True where the value is known to match without a python call, the other values are left to match_one
+        """
+        return pd.Series(False, index=values.index)
+
+    def match_values(self, values):
+        """
+        boolean array of the given distinct values
+        """
+        matched = self.fast_match(values).to_numpy(dtype=bool)
+        rest = ~matched
+        if rest.any():
+            matched[rest] = [self.match_one(value) for value in values[rest]]
+        return matched
+
+    def match_series(self, series):
+        """
+        boolean mask of a column of non-empty strings, each distinct value is matched once
+        """
+        codes, uniques = pd.factorize(series)
+        return pd.Series(self.match_values(pd.Series(uniques, dtype=object))[codes], index=series.index)
+
+    def prime(self, series, matched=None):
+        """
+        match the distinct non-empty values of a column in one go, ahead of the cell by cell schema validation,
+        matched: optional mask of the cells already known to match
+        """
+        recent = []
+        if matched is not None:
+            recent = series[matched].unique()
+            self.matches.update(dict.fromkeys(recent, True))
+            series = series[~matched]
+        values = pd.Series(series.dropna().unique(), dtype=object)
+        values = values[values != ""]
+        new = values[~values.isin(self.matches.keys())]
+        if len(new):
+            self.matches.update(zip(new, self.match_values(new).tolist()))
+        if len(self.matches) > self.max_matches:
+            self.evict([*recent, *values])
+
+    def evict(self, recent=()):
+        """
+        forget the least recently matched values, down to max_matches besides the recent values
+        """
+        kept = {value: self.matches.pop(value) for value in recent if value in self.matches}
+        others = list(self.matches.items())
+        self.matches = dict(others[max(len(others) - max(self.max_matches - len(kept), 0), 0):])
+        self.matches.update(kept)
+
+    def match(self, instance):
+        try:
+            return self.matches[instance]
+        except KeyError:
+            result = self.matches[instance] = self.match_one(instance)
+            if len(self.matches) > self.max_matches:
+                self.evict()
+            return result
+
+
+class EMOBONList(BatchMatch, DataType):
     @staticmethod
-    def match(instance):
+    def match_one(instance):
         assert instance
         if "," in instance:  # list must not contain commas
             return False
         else:
             return True
 
+    def match_values(self, values):
+        return ~values.str.contains(",", regex=False).to_numpy(dtype=bool)
+
 
-class EMOBONRange(DataType):
+class EMOBONRange(BatchMatch, DataType):
     @staticmethod
-    def match(instance):
+    def match_one(instance):
         assert instance
         try:
             a, b = map(str.strip, instance.split("-"))
@@ -37,3 +164,44 @@ class EMOBONRange(DataType):
             return True
         except (ValueError, AssertionError):
             return False
+
+    def match_values(self, values):
+        if values.empty:
+            return np.zeros(0, dtype=bool)
+        parts = values.str.partition("-")
+        a, dash, b = parts[0], parts[1], parts[2]
+        single_dash = (dash == "-") & ~b.str.contains("-", regex=False)
+        a = to_floats(a.where(single_dash, "").str.strip())
+        b = to_floats(b.where(single_dash, "").str.strip())
+        return (single_dash & (a < b)).to_numpy(dtype=bool)  # comparisons with NaN are False, like with float("nan")
+
+
+class BatchXSDFloat(BatchMatch, XSDFloat):
+    def fast_match(self, values):
+        return values.str.fullmatch(FLOAT_PATTERN).astype(bool)
+
+
+class BatchXSDDouble(BatchMatch, XSDDouble):
+    def fast_match(self, values):
+        return values.str.fullmatch(FLOAT_PATTERN).astype(bool)
+
+
+class BatchXSDInteger(BatchMatch, XSDInteger):
+    def fast_match(self, values):
+        return values.str.fullmatch(INTEGER_PATTERN).astype(bool)
+
+
+class BatchXSDDate(BatchMatch, XSDDate):
+    def fast_match(self, values):
+        canonical = values.str.fullmatch(DATE_PATTERN).astype(bool)
+        return canonical & pd.to_datetime(values.where(canonical), format="%Y-%m-%d", errors="coerce").notna()
+
+
+class BatchXSDDateTime(BatchMatch, XSDDateTime):
+    def __init__(self, formats):
+        super().__init__(formats)
+        self.minutes = "%Y-%m-%dT%H:%M" in formats  # the canonical form is one of the formats
+
+    def fast_match(self, values):
+        canonical = values.str.fullmatch(DATETIME_PATTERN).astype(bool) & self.minutes
+        return canonical & pd.to_datetime(values.where(canonical), format="%Y-%m-%dT%H:%M", errors="coerce").notna()
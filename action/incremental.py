@@ -0,0 +1,182 @@
+"""
+incremental data quality control, rules only revalidate the rows that changed since the previous run
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from contextvars import ContextVar
+from functools import wraps
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from py_data_rules.data_model import DataModel
+from .budget import INCOMPLETE
+from .violations import ViolationBatch
+
+logger = logging.getLogger(__name__)
+
+current_unresolved = ContextVar("current_unresolved", default=None)  # alias -> index labels, of the running rule
+
+
+def unresolved(alias, rows):
+    """
+    mark the rows of a table whose values could not be looked up by the current rule, e.g. at a failed orcid or
+    ncbi request, they are left out of the manifest so that the next run controls them again
+    """
+    collected = current_unresolved.get()
+    if collected is not None:
+        collected.setdefault(alias, []).extend(rows)
+
+
+def code_signature():
+    """
+    hash of the action source, cached violations are discarded whenever the rules may have changed
+    """
+    sha256 = hashlib.sha256()
+    for path in sorted(Path(__file__).parent.glob("*.py")):
+        sha256.update(path.read_bytes())
+    return sha256.hexdigest()
+
+
+class RowSubset:
+    """
+    view on a data model that only exposes the given rows of some of its tables
+    """
+    def __init__(self, data_model, rows):
+        self.data_model = data_model
+        self.rows = rows  # alias -> index labels
+
+    def __getitem__(self, alias):
+        df = self.data_model[alias]
+        if alias in self.rows:
+            return df.loc[self.rows[alias]]
+        return df
+
+    def __getattr__(self, name):
+        return getattr(self.data_model, name)
+
+
+class IncrementalState:
+    """
+    per-row content hashes and per-rule violations of the previous run, kept in a manifest next to dqc.csv
+    """
+    def __init__(self, path, aliases, full_rebuild=False):
+        self.path = Path(path)
+        self.aliases = list(aliases)
+        self.signature = code_signature()
+        self.previous = {"tables": {}, "violations": {}}
+        if full_rebuild:
+            logger.info("full rebuild requested, revalidating all rows")
+        elif self.path.exists():
+            try:
+                previous = json.loads(self.path.read_text())
+            except ValueError:
+                logger.warning(f"discarding unreadable manifest {self.path}")
+            else:
+                if previous.get("signature") == self.signature:
+                    self.previous = previous
+                else:
+                    logger.info("rules changed since the previous run, revalidating all rows")
+        self.tables = None  # alias -> column names, index labels and row hashes of this run
+        self.changed = {}  # alias -> index labels of the new or changed rows
+        self.unchanged = {}  # alias -> index labels of the unchanged rows
+        self.dirty = {}  # alias -> whether any row was added, changed or removed
+        self.violations = {}  # rule name -> violations of this run
+        self.unresolved = {}  # alias -> index labels of the rows with failed lookups, not recorded in the manifest
+        self.lock = threading.Lock()
+
+    def prepare(self, data_model: DataModel):
+        with self.lock:
+            if self.tables is None:
+                self._prepare(data_model)
+
+    def _prepare(self, data_model: DataModel):
+        tables = {}
+        for alias in self.aliases:
+            df = data_model[alias]
+            hashes = pd.util.hash_pandas_object(df, index=False)
+            tables[alias] = {
+                "columns": list(df.columns),
+                "index": df.index.tolist(),
+                "hashes": hashes.tolist(),
+            }
+            same = pd.Series(False, index=df.index)
+            previous = self.previous["tables"].get(alias)
+            if previous is not None and previous["columns"] == list(df.columns):
+                old = pd.Series(previous["hashes"], index=previous["index"], dtype="uint64")
+                common = df.index.intersection(old.index)
+                same[common] = hashes[common].to_numpy() == old[common].to_numpy()
+                removed = len(old) > same.sum()
+            else:
+                removed = False
+            self.changed[alias] = df.index[~same]
+            self.unchanged[alias] = df.index[same]
+            self.dirty[alias] = removed or len(self.changed[alias]) > 0
+            logger.info(f"{alias}: {len(self.changed[alias])} new or changed rows")
+        self.tables = tables
+
+    def wrap(self, fn, name):
+        """
+        run the rule on the new or changed rows only and merge with its cached violations for the other rows,
+        the rule reruns in full when one of its dependencies changed
+        """
+        dependencies = getattr(fn, "dependencies", [])
+
+        @wraps(fn)
+        def wrapper(data_model: DataModel) -> ViolationBatch:
+            self.prepare(data_model)
+            cached = self.previous["violations"].get(name)
+            full = cached is None or any(self.dirty.get(alias, True) for alias in dependencies)
+            token = current_unresolved.set({})
+            try:
+                if full:
+                    result = fn(data_model)
+                else:
+                    rows = {alias: self.changed[alias] for alias in self.aliases if alias not in dependencies}
+                    result = fn(RowSubset(data_model, rows))
+                collected = current_unresolved.get()
+            finally:
+                current_unresolved.reset(token)
+            with self.lock:
+                for alias, labels in collected.items():
+                    self.unresolved.setdefault(alias, set()).update(labels)
+            if not full:
+                fresh = result
+                cached = ViolationBatch.from_json(cached)
+                tables, cached_rows = cached.field("table"), cached.field("row")
+                keep = np.zeros(len(cached), dtype=bool)
+                for alias in self.aliases:
+                    if alias not in dependencies:
+                        keep |= (tables == alias) & np.isin(cached_rows - 1, self.unchanged[alias])
+                kept = cached.take(keep)
+                result = ViolationBatch.concat([kept, fresh])
+                order = {alias: i for i, alias in enumerate(self.aliases)}
+                ranks = pd.Series(result.field("table")).map(order).fillna(len(order)).to_numpy()
+                result = result.take(np.lexsort((result.field("row"), ranks)))
+                logger.info(f"{name}: {len(fresh)} new violations, {len(kept)} reused")
+            if not (result.field("diagnosis") == INCOMPLETE).any():  # otherwise rerun in full next time
+                self.violations[name] = result
+            return result
+        return wrapper
+
+    def save(self):
+        if self.tables is None:  # no rule ran
+            return
+        tables = dict(self.tables)
+        for alias, rows in self.unresolved.items():
+            kept = [(index, h) for index, h in zip(self.tables[alias]["index"], self.tables[alias]["hashes"]) if index not in rows]
+            tables[alias] = {
+                "columns": self.tables[alias]["columns"],
+                "index": [index for index, _ in kept],
+                "hashes": [h for _, h in kept],
+            }
+        manifest = {
+            "signature": self.signature,
+            "tables": tables,
+            "violations": {name: violations.to_json() for name, violations in self.violations.items()},
+        }
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(manifest))
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,234 @@
+"""
+resolvers of external identifiers used by the data quality control rules
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from contextvars import copy_context
+from .budget import expired, remaining
+from .metrics import count_http
+
+logger = logging.getLogger(__name__)
+
+NCBI_ESUMMARY_URL = os.getenv(
+    "NCBI_ESUMMARY_URL", "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esummary.fcgi"
+)
+NCBI_API_KEY = os.getenv("NCBI_API_KEY")
+ORCID_API_URL = os.getenv("ORCID_API_URL", "https://pub.orcid.org/v3.0/{orcid}")
+TAXONOMY_INDEX = os.getenv("TAXONOMY_INDEX")  # offline taxonomy index instead of ncbi, see action/taxonomy.py
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}  # of the orcid api, retried with a backoff while the deadline allows
+
+UNRESOLVED = ""  # cached for the tax_ids unknown to ncbi, so they are not requested again until the entry expires
+
+
+class TaxonomyResolver:
+    """
+    tax_id -> scientific name, resolved in batches through the ncbi e-utilities,
+    tax_ids unknown to ncbi are cached as UNRESOLVED, those of a failed request are not cached
+    """
+    def __init__(self, cache=None, batch_size=200, timeout=30):
+        self.cache = cache
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.tax_id2scientific_name = {}
+        self.skipped = set()  # not looked up before the deadline of the calling rule
+
+    def _lookup(self, tax_id):
+        if tax_id in self.tax_id2scientific_name:
+            return self.tax_id2scientific_name[tax_id]
+        if self.cache is not None:
+            return self.cache.get(tax_id)
+        return None
+
+    def _fetch(self, batch):
+        import requests  # only imported when a lookup is not served from the cache
+
+        timeout = remaining(self.timeout)
+        if not timeout:
+            return {}
+        params = {"db": "taxonomy", "id": ",".join(batch), "retmode": "json"}
+        if NCBI_API_KEY:
+            params["api_key"] = NCBI_API_KEY
+        try:
+            r = requests.get(
+                NCBI_ESUMMARY_URL, params=params, timeout=timeout, hooks={"response": count_http}
+            )
+            r.raise_for_status()
+            result = r.json()["result"]
+        except (requests.RequestException, ValueError, KeyError):
+            logger.error(f"ncbi taxonomy api failure for {', '.join(batch)}")
+            return {}
+        resolved = {}
+        for tax_id in batch:
+            scientific_name = result.get(tax_id, {}).get("scientificname")
+            if scientific_name:
+                resolved[tax_id] = scientific_name
+            else:
+                logger.error(f"ncbi taxonomy api failure for {tax_id}")
+                resolved[tax_id] = UNRESOLVED
+        return resolved
+
+    def resolve(self, tax_ids):
+        """
+        look up all given tax_ids, only those missing from the cache are requested,
+        the batches left when the deadline of the calling rule passes are skipped
+        """
+        tax_ids = list(dict.fromkeys(tax_ids))
+        unseen = []
+        for tax_id in tax_ids:
+            scientific_name = self._lookup(tax_id)
+            if not tax_id.isdigit():
+                logger.error(f"invalid tax_id {tax_id}")
+            elif scientific_name is None:
+                unseen.append(tax_id)
+            else:
+                self.tax_id2scientific_name[tax_id] = scientific_name
+        self.skipped.difference_update(unseen)
+        for i in range(0, len(unseen), self.batch_size):
+            batch = unseen[i:i + self.batch_size]
+            resolved = {} if expired() else self._fetch(batch)
+            if expired():  # not requested or cut short by the deadline
+                self.skipped.update(set(batch) - set(resolved))
+            self.tax_id2scientific_name.update(resolved)
+            if self.cache is not None:
+                self.cache.update(resolved)
+        if unseen and self.cache is not None:
+            self.cache.save()
+        if self.skipped:
+            logger.warning(f"time budget exhausted, {len(self.skipped)} tax_ids were not looked up")
+        return {
+            tax_id: self.tax_id2scientific_name[tax_id]
+            for tax_id in tax_ids
+            if self.tax_id2scientific_name.get(tax_id, UNRESOLVED) != UNRESOLVED
+        }
+
+
+class OrcidResolver:
+    """
+    orcid -> person name, resolved concurrently through the public orcid api,
+    a lookup is retried retries times after a backoff of backoff_factor * 2 ** (retry - 1) seconds,
+    each attempt and each backoff only as long as the deadline of the calling rule allows
+    """
+    def __init__(self, cache=None, max_workers=8, timeout=10, retries=3, backoff_factor=0.5):
+        self.cache = cache
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.orcid2name = {}
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.failed = set()  # not retried within the same run
+        self.skipped = set()  # not looked up before the deadline of the calling rule, retried by later callers
+        self.lock = threading.Lock()
+        self.session = None  # created for the first lookup that is not served from the cache
+
+    def _session(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers, max_retries=0)  # see _fetch
+        session = requests.Session()
+        session.headers.update({"Accept": "application/json"})
+        session.hooks["response"].append(count_http)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def _fetch(self, orcid):
+        import requests
+        import uritemplate
+
+        uri = uritemplate.expand(ORCID_API_URL, {"orcid": orcid})
+        for attempt in range(self.retries + 1):
+            if attempt:
+                backoff = self.backoff_factor * 2 ** (attempt - 1)
+                if remaining(backoff) < backoff:  # the deadline passes before the retry
+                    break
+                time.sleep(backoff)
+            timeout = remaining(self.timeout)
+            if not timeout:
+                break
+            try:
+                r = self.session.get(uri, timeout=timeout)
+            except requests.RequestException:
+                continue
+            if r.status_code in RETRY_STATUSES:
+                continue
+            if r.status_code == 200:
+                try:
+                    r = r.json()["person"]["name"]
+                    return r["given-names"]["value"] + " " + r["family-name"]["value"]
+                except (ValueError, KeyError, TypeError):
+                    pass
+            break
+        logger.error(f"orcid api failure for {orcid}")
+        return None
+
+    def _fetch_all(self, orcids):
+        """
+        look up the orcids on up to max_workers daemon threads, each takes the next orcid until none are left or the
+        deadline of the calling rule passes, returns orcid -> name of the lookups that succeeded and whether some were
+        still in flight at the deadline, those are abandoned (a daemon thread does not hold up the interpreter at exit)
+        """
+        pending = queue.SimpleQueue()
+        for orcid in orcids:
+            pending.put(orcid)
+        resolved = {}
+        lock = threading.Lock()
+
+        def work():
+            while not expired():
+                try:
+                    orcid = pending.get_nowait()
+                except queue.Empty:
+                    return
+                name = self._fetch(orcid)
+                if name is not None:
+                    with lock:
+                        resolved[orcid] = name
+
+        # each thread runs in a copy of the caller's context, so its deadline is that of the calling rule
+        # and its traffic is attributed to it
+        threads = [
+            threading.Thread(target=copy_context().run, args=(work,), daemon=True, name="orcid-lookup")
+            for _ in range(min(self.max_workers, len(orcids)))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(remaining())
+        with lock:
+            return dict(resolved), any(thread.is_alive() for thread in threads)
+
+    def resolve(self, orcids):
+        """
+        look up all given orcids, only those missing from the cache are requested,
+        the lookups still pending when the deadline of the calling rule passes are abandoned
+        """
+        orcids = list(dict.fromkeys(orcids))
+        with self.lock:  # concurrent callers wait for the lookups in flight instead of repeating them
+            unseen = []
+            for orcid in orcids:
+                if orcid in self.orcid2name or orcid in self.failed:
+                    continue
+                name = self.cache.get(orcid) if self.cache is not None else None
+                if name is None:
+                    unseen.append(orcid)
+                else:
+                    self.orcid2name[orcid] = name
+            if unseen:
+                if self.session is None:
+                    self.session = self._session()
+                resolved, pending = self._fetch_all(unseen)
+                self.skipped.difference_update(unseen)
+                if pending or expired():  # not requested or cut short by the deadline
+                    self.skipped.update(set(unseen) - set(resolved))
+                    logger.warning(f"time budget exhausted, {len(self.skipped)} orcids were not looked up")
+                self.failed.update(set(unseen) - set(resolved) - self.skipped)
+                self.orcid2name.update(resolved)
+                if self.cache is not None:
+                    self.cache.update(resolved)
+                    self.cache.save()
+        return {orcid: self.orcid2name[orcid] for orcid in orcids if orcid in self.orcid2name}
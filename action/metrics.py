@@ -0,0 +1,162 @@
+"""
+performance instrumentation of the stages and rules of a run
+"""
+import json
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from py_data_rules.data_model import DataModel
+from .violations import ViolationBatch
+
+try:
+    import resource
+except ImportError:  # not available on windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+current_record = ContextVar("current_record", default=None)
+http_lock = threading.Lock()
+
+
+def max_rss_mb():
+    """
+    high-water mark of the resident memory of the process so far, not reset between stages or rules,
+    a stage that raised it is one whose value is above that of the stage before
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # bytes on macos, kilobytes elsewhere
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+def count_http(response, *args, **kwargs):
+    """
+    requests response hook, the call is attributed to the innermost stage or rule being measured
+    """
+    record = current_record.get()
+    if record is not None:
+        with http_lock:
+            record["http_calls"] += 1
+            record["http_bytes"] += len(response.content)
+    return response
+
+
+class TableAccess:
+    """
+    view on a data model that counts the rows of the tables a rule reads
+    """
+    def __init__(self, data_model):
+        self.data_model = data_model
+        self.lengths = {}
+
+    @property
+    def rows(self):
+        return sum(self.lengths.values())
+
+    def __getitem__(self, alias):
+        df = self.data_model[alias]
+        self.lengths[alias] = len(df)
+        return df
+
+    def __getattr__(self, name):
+        return getattr(self.data_model, name)
+
+
+class Metrics:
+    """
+    wall and cpu time, rows, violations and http traffic per stage and per rule, with the max rss of the process
+    at the end of each
+    """
+    def __init__(self):
+        self.stages = []
+        self.rules = {}  # rule position -> record
+
+    @contextmanager
+    def _measure(self, name, cpu_clock):
+        record = {
+            "name": name,
+            "wall_seconds": None,
+            "cpu_seconds": None,
+            "rows": None,
+            "violations": None,
+            "http_calls": 0,
+            "http_bytes": 0,
+            "max_rss_mb": None,
+        }
+        token = current_record.set(record)
+        start, cpu_start = time.perf_counter(), cpu_clock()
+        try:
+            yield record
+        finally:
+            record["wall_seconds"] = round(time.perf_counter() - start, 6)
+            record["cpu_seconds"] = round(cpu_clock() - cpu_start, 6)
+            record["max_rss_mb"] = max_rss_mb()
+            current_record.reset(token)
+
+    @contextmanager
+    def stage(self, name):
+        with self._measure(name, time.process_time) as record:
+            self.stages.append(record)
+            yield record
+
+    def timed_reader(self, reader):
+        """
+        wrap a logsheet reader so that every table read is measured as a stage
+        """
+        @wraps(reader)
+        def wrapper(path):
+            with self.stage(f"{reader.__name__} {path.name}") as record:
+                df = reader(path)
+                record["rows"] = len(df)
+            return df
+        return wrapper
+
+    def wrap(self, fn, name):
+        key = len(self.rules)
+        self.rules[key] = None
+
+        @wraps(fn)
+        def wrapper(data_model: DataModel) -> ViolationBatch:
+            table_access = TableAccess(data_model)
+            with self._measure(name, time.thread_time) as record:  # rules may run on their own thread
+                result = fn(table_access)
+                record["rows"] = table_access.rows
+                record["violations"] = len(result)
+            self.rules[key] = record
+            return result
+        return wrapper
+
+    def save(self, path):
+        metrics = {
+            "stages": self.stages,
+            "rules": [record for record in self.rules.values() if record is not None],
+        }
+        path.write_text(json.dumps(metrics, indent=2))
+
+    def log_summary(self, top=5):
+        lines = ["performance summary"]
+        for record in self.stages:
+            lines.append(
+                f"  {record['name']}: {record['wall_seconds']:.3f}s wall, {record['cpu_seconds']:.3f}s cpu"
+                + (f", {record['rows']} rows" if record["rows"] is not None else "")
+                + (f", {record['http_calls']} http calls" if record["http_calls"] else "")
+            )
+        rules = sorted(
+            (record for record in self.rules.values() if record is not None),
+            key=lambda record: record["wall_seconds"],
+            reverse=True,
+        )
+        if rules:
+            lines.append("  slowest rules:")
+        for record in rules[:top]:
+            lines.append(
+                f"    {record['name']}: {record['wall_seconds']:.3f}s wall, {record['violations']} violations"
+                + (f", {record['http_calls']} http calls" if record["http_calls"] else "")
+            )
+        lines.append(f"  max rss of the process: {max_rss_mb()} MB")
+        logger.info("\n".join(lines))
@@ -0,0 +1,120 @@
+"""
+change-aware notification of the end user, driven by a fingerprint of the violations in report.csv
+"""
+import hashlib
+import logging
+import os
+import re
+from collections import Counter
+from datetime import date
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")  # set by github actions, or a local fake
+ISSUE_TITLE = "Data Quality Control"  # the issues created by the action are titled "Data Quality Control YYYY-MM-DD"
+ISSUE_TITLE_PATTERN = re.compile(rf"{re.escape(ISSUE_TITLE)} [0-9]{{4}}-[0-9]{{2}}-[0-9]{{2}}")
+
+
+class ReportDigest:
+    """
+    64-bit hashes of the rows of a report.csv and their diagnoses, the fingerprint does not depend on the row order
+    """
+    def __init__(self, hashes, diagnoses):
+        self.hashes = hashes
+        self.diagnoses = diagnoses
+
+    @classmethod
+    def read(cls, path):
+        """
+        digest of the report at path, None if there is no report (yet)
+        """
+        if not path.exists():
+            return None
+        df = pd.read_csv(path, dtype=str, keep_default_na=False)
+        return cls(pd.util.hash_pandas_object(df, index=False).to_numpy(), df["Diagnosis"].to_numpy(dtype=object))
+
+    @property
+    def fingerprint(self):
+        return hashlib.sha256(np.sort(self.hashes).tobytes()).hexdigest()
+
+
+class ReportChanges:
+    """
+    violations new since the previous report and violations resolved since, counted per diagnosis
+    """
+    def __init__(self, previous, current):
+        self.previous = previous
+        self.current = current
+        if previous is None:
+            self.new = Counter(current.diagnoses)
+            self.resolved = Counter()
+        else:
+            self.new = Counter(current.diagnoses[~np.isin(current.hashes, previous.hashes)])
+            self.resolved = Counter(previous.diagnoses[~np.isin(previous.hashes, current.hashes)])
+
+    @property
+    def unchanged(self):
+        return self.previous is not None and self.previous.fingerprint == self.current.fingerprint
+
+    def summary(self):
+        """
+        markdown summary of the changes, for the issue or its comment
+        """
+        lines = [
+            f"{len(self.current.hashes)} violations are reported, "
+            f"{sum(self.new.values())} new and {sum(self.resolved.values())} resolved since the previous report."
+        ]
+        diagnoses = sorted(set(self.new) | set(self.resolved), key=lambda d: (-self.new[d] - self.resolved[d], d))
+        if diagnoses:
+            lines += ["", "| Diagnosis | New | Resolved |", "| --- | ---: | ---: |"]
+            lines += [f"| {d or '(none)'} | {self.new[d]} | {self.resolved[d]} |" for d in diagnoses]
+        return "\n".join(lines)
+
+
+@lru_cache(maxsize=None)
+def github_client(token):
+    """
+    a single client per token, so that runs in the same process share its connection,
+    objects are lazy, they are only read from the api when one of their attributes is needed
+    """
+    from github import Auth, Github  # only needed to notify, pygithub is slow to import
+
+    return Github(auth=Auth.Token(token), base_url=GITHUB_API_URL, lazy=True)
+
+
+def open_issue(repo, assignee=None):
+    """
+    the open issue created by an earlier run of the action for the assignee, if any,
+    pull requests are listed as issues by the api and are skipped
+    """
+    for issue in repo.get_issues(state="open", **({"assignee": assignee} if assignee else {})):
+        # the title first, pull_request is not in the listing of an issue and is read with the issue itself
+        if ISSUE_TITLE_PATTERN.fullmatch(issue.title) and issue.pull_request is None:
+            return issue
+    return None
+
+
+def create_issue(token, repository, threshold_date, assignee, changes=None):
+    """
+    comment on the open data quality control issue, or create one if there is none,
+    the message summarizes the changes since the previous report
+    """
+    repo = github_client(token).get_repo(repository)  # lazy, the repository itself is not read
+    body = (
+        f"A new [logfile](https://github.com/{repository}/blob/main/data-quality-control/logfile) and [report](https://github.com/{repository}/blob/main/data-quality-control/report.csv) are available. "
+        f"Have a look at the logfile first to see if any problems were encountered during the data quality control.\n\n"
+        f"Data were controlled up to {threshold_date}, this date can be changed by modifying the `data_quality_control_threshold_date` in [governance-data/logsheets.csv](https://github.com/emo-bon/governance-data/blob/main/logsheets.csv) (date format is YYYY-MM-DD)."
+    )
+    if changes is not None:
+        body += "\n\n" + changes.summary()
+    issue = open_issue(repo, assignee)
+    if issue is not None:
+        issue.create_comment(f"**{ISSUE_TITLE} {date.today()}**\n\n{body}")
+        logger.info(f"commented on issue #{issue.number} of {repository}")
+    else:
+        issue = repo.create_issue(title=f"{ISSUE_TITLE} {date.today()}", body=body, assignee=assignee)
+        logger.info(f"created issue #{issue.number} in {repository}")
+    return issue
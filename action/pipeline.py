@@ -1,24 +1,49 @@
+import logging
+import time
 import pandas as pd
-from .data_model import read_emobon_csv
+from .columnar import write_logsheet
+from .extensions import read_emobon_csv
+from .violations import ViolationBuffer
+
+logger = logging.getLogger(__name__)
+
 
 class Pipeline:
-    def __init__(self, input_path, output_path, dqc_path, alias2basename):
+    def __init__(self, input_path, output_path, violations, alias2basename, reader=read_emobon_csv, columnar=False):
         self.input_path = input_path
         self.output_path = output_path
-        self.dqc_path = dqc_path
+        self.violations = violations
         self.alias2basename = alias2basename
+        self.reader = reader
+        self.columnar = columnar
 
     def quick_fix(self):
-        df_repair = self.dqc[~self.dqc["repair"].isna()]
-        for _, row in df_repair.iterrows():
-            self.dfs[row["table"]].at[row["row"] - 1, row["column"]] = row["repair"]
+        if isinstance(self.violations, ViolationBuffer):
+            df_repair = self.violations.repairs()
+        else:
+            df_repair = pd.DataFrame(
+                [
+                    (v.table, v.column, v.row, v.repair)
+                    for v in self.violations
+                    if not pd.isna(v.repair) and v.repair != ""
+                ],
+                columns=["table", "column", "row", "repair"],
+            )
+        df_repair = df_repair.drop_duplicates(subset=["table", "column", "row"], keep="last")
+        for table, df_table in df_repair.groupby("table", sort=False):
+            start = time.perf_counter()
+            df = self.dfs[table] = self.dfs[table].copy()  # the input may be shared with earlier stages
+            for column, df_column in df_table.groupby("column", sort=False):
+                if isinstance(df[column].dtype, pd.CategoricalDtype):  # a compact column, the repairs may be new values
+                    df[column] = df[column].astype(object)
+                df.loc[df_column["row"].to_numpy() - 1, column] = df_column["repair"].to_numpy()
+            logger.info(f"repaired {len(df_table)} cells in {table} in {time.perf_counter() - start:.3f}s")
     
     def run(self):
         # read input
-        self.dqc = pd.read_csv(self.dqc_path)
         self.dfs = {}
         for alias, base_name in self.alias2basename.items():
-            self.dfs[alias] = read_emobon_csv(self.input_path / f"{base_name}.csv")
+            self.dfs[alias] = self.reader(self.input_path / f"{base_name}.csv")
 
         # quick fixes
         self.quick_fix()
@@ -36,3 +61,5 @@ class Pipeline:
         for alias, df in self.dfs.items():
             base_name = self.alias2basename[alias]
             df.to_csv(self.output_path / f"{base_name}.csv", index=False)
+            if self.columnar:
+                write_logsheet(df, self.output_path / f"{base_name}.parquet")
@@ -0,0 +1,135 @@
+"""
+streaming violation sink, the end user report is written in the same pass as the violations are consumed
+"""
+import csv
+import json
+import logging
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+DQC_COLUMNS = ["table", "column", "row", "value", "diagnosis", "extended_diagnosis", "repair", "file_path", "data_type", "nullable"]
+REPORT_COLUMNS = ["Diagnosis", "LogsheetType", "LogsheetTab", "Column", "Row", "Value", "ExtendedDiagnosis", "FilePath", "DataType", "Requirement"]
+
+# cells read as missing by pd.read_csv, the report has always treated these as empty
+NA_VALUES = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+}
+LOGSHEET_TYPE = {"s": "sediment", "w": "water"}  # first letter of the table alias
+LOGSHEET_TAB = {"m": "measured", "o": "observatory", "s": "sampling"}  # second letter of the table alias
+REQUIREMENT = {
+    **dict.fromkeys(["True", "TRUE", "true"], "optional"),
+    **dict.fromkeys(["False", "FALSE", "false"], "mandatory"),
+}
+
+
+class ViolationSink:
+    """
+    consumes batches of violations (see action/violations.py), optionally writes them to dqc.csv, writes the
+    unrepaired ones to report.csv and counts them per diagnosis and per column on the way,
+    append: the engine already wrote the violations of the run to dqc.csv, the others are appended
+    """
+    def __init__(self, report_path, dqc_path=None, append=False):
+        self.report_path = report_path
+        self.dqc_path = dqc_path
+        self.append = append
+        self.table_lookup = {}  # table alias -> (LogsheetType, LogsheetTab)
+        self.diagnoses = Counter()
+        self.columns = Counter()  # (table, column) -> violations
+        self.rows = 0
+        self.report_rows = 0
+
+    def __enter__(self):
+        self.report_file = open(self.report_path, "w", newline="", encoding="utf-8")
+        self.report_writer = csv.writer(self.report_file, lineterminator="\n")
+        self.report_writer.writerow(REPORT_COLUMNS)
+        if self.dqc_path is not None:
+            # appended to as long as the engine wrote the same columns, otherwise rewritten with those of the run
+            self.append = self.append and self.read_header(self.dqc_path) == DQC_COLUMNS
+            self.dqc_file = open(self.dqc_path, "a" if self.append else "w", newline="", encoding="utf-8")
+            self.dqc_writer = csv.writer(self.dqc_file, lineterminator="\n")
+            if not self.append:
+                self.dqc_writer.writerow(DQC_COLUMNS)
+        return self
+
+    def __exit__(self, *exc):
+        self.report_file.close()
+        if self.dqc_path is not None:
+            self.dqc_file.close()
+
+    @staticmethod
+    def read_header(path):
+        """
+        header of a dqc.csv, None if there is none
+        """
+        try:
+            with open(path, newline="", encoding="utf-8") as f:
+                return next(csv.reader(f), None)
+        except FileNotFoundError:
+            return None
+
+    def decode_table(self, table):
+        if table not in self.table_lookup:
+            if table in NA_VALUES:
+                self.table_lookup[table] = ("NULL", "NULL")
+            else:
+                self.table_lookup[table] = (
+                    LOGSHEET_TYPE.get(table[:1], "NULL"),
+                    LOGSHEET_TAB.get(table[1:2], "NULL"),
+                )
+        return self.table_lookup[table]
+
+    def consume_buffer(self, buffer, written=False):
+        """
+        the violations of a ViolationBuffer, as the engine wrote them to its dqc.csv (see ViolationBuffer.read_dqc),
+        written: they are in the dqc.csv of the sink already
+        """
+        self.consume_batch(buffer.dqc, dqc=not (written and self.append))
+
+    def consume_batch(self, batch, dqc=True):
+        """
+        a ViolationBatch, dqc: whether to write it to dqc.csv
+        """
+        cells = batch.cells()
+        table, column, row, value, diagnosis, extended_diagnosis, repair, file_path, data_type, nullable = cells
+        if self.dqc_path is not None and dqc:
+            self.dqc_writer.writerows(zip(*(column_cells.tolist() for column_cells in cells)))
+        self.rows += len(row)
+        self.diagnoses.update(Counter(diagnosis))
+        self.columns.update(Counter(zip(table, column)))
+        reported = [i for i, cell in enumerate(repair) if cell in NA_VALUES]  # the others are repaired
+        self.report_rows += len(reported)
+        logsheets = [self.decode_table(cell) for cell in table[reported]]
+        self.report_writer.writerows(
+            zip(
+                ["" if cell in NA_VALUES else cell for cell in diagnosis[reported]],
+                [logsheet_type for logsheet_type, _ in logsheets],
+                [logsheet_tab for _, logsheet_tab in logsheets],
+                ["" if cell in NA_VALUES else cell for cell in column[reported]],
+                row[reported],
+                ["<empty>" if cell in NA_VALUES else cell for cell in value[reported]],
+                ["\\" if cell in NA_VALUES else cell for cell in extended_diagnosis[reported]],
+                ["" if cell in NA_VALUES else cell for cell in file_path[reported]],
+                ["" if cell in NA_VALUES else cell for cell in data_type[reported]],
+                [REQUIREMENT.get(cell, "NULL") for cell in nullable[reported]],
+            )
+        )
+
+    def save_counts(self, path):
+        counts = {
+            "violations": self.rows,
+            "reported": self.report_rows,
+            "diagnoses": dict(self.diagnoses.most_common()),
+            "columns": [
+                {"table": table, "column": column, "violations": n}
+                for (table, column), n in self.columns.most_common()
+            ],
+        }
+        path.write_text(json.dumps(counts, indent=2))
+
+    def log_summary(self, top=5):
+        lines = [f"{self.rows} violations, {self.report_rows} reported"]
+        for diagnosis, n in self.diagnoses.most_common(top):
+            lines.append(f"  {diagnosis}: {n}")
+        logger.info("\n".join(lines))
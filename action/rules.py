@@ -1,178 +1,335 @@
 import logging
 import re
-import requests
-import uritemplate
+import numpy as np
+import pandas as pd
 import py_data_rules.rule_factory as rf
-from bs4 import BeautifulSoup
+from functools import wraps
 from inspect import getmembers, isfunction
-from typing import List
+from typing import Dict, List, Optional
 from py_data_rules.data_model import DataModel
-from py_data_rules.rule import Rule
 from py_data_rules.violation import Violation
+from .budget import unverified
+from .cache import LookupCache
+from .dates import DateCache
+from .incremental import RowSubset, unresolved
+from .lookups import TAXONOMY_INDEX, OrcidResolver, TaxonomyResolver
+from .taxonomy import TaxonomyIndex
+from .violations import ViolationBatch
 
 logger = logging.getLogger(__name__)
 
 
+def isna_mask(data_model: DataModel, series: pd.Series) -> pd.Series:
+    """
+    column-wise DataModel.isna, evaluated once per distinct value
+    """
+    na_values = [value for value in series.unique() if data_model.isna(value)]
+    return series.isin(na_values)
+
+
+def as_strings(series: pd.Series) -> pd.Series:
+    """
+    object column of a compact frame (see action/compact.py), for the operations categoricals do not support
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.astype(object)
+    return series
+
+
+def to_integer_string(value: str) -> Optional[str]:
+    try:
+        return str(int(value))
+    except ValueError:
+        return None
+
+
+def to_integer_strings(series: pd.Series) -> pd.Series:
+    """
+    column-wise str(int(value)), NaN where int() fails
+    plain digit strings are handled without a python call, anything else int() accepts falls back to to_integer_string
+    """
+    digits = series.str.fullmatch(r"[0-9]+").astype(bool)
+    result = series.str.lstrip("0").replace("", "0").where(digits)
+    rest = series[~digits]
+    if len(rest):
+        result[~digits] = rest.map({value: to_integer_string(value) for value in rest.unique()})
+    return result
+
+
+def join_exploded(pieces: pd.Series, sep: str = ";") -> pd.Series:
+    """
+    inverse of str.split(sep).explode(), the pieces of every row are joined back together
+    """
+    if pieces.empty:
+        return pd.Series([], dtype=object)
+    values = pieces.to_numpy()
+    index = pieces.index.to_numpy()
+    starts = np.flatnonzero(np.r_[True, index[1:] != index[:-1]])
+    ends = np.r_[starts[1:], len(values)]
+    return pd.Series([sep.join(values[start:end]) for start, end in zip(starts, ends)], index=index[starts], dtype=object)
+
+
+def depends_on(aliases):
+    """
+    declare the tables a rule reads as a whole, besides the rows it checks
+    """
+    def decorator(fn):
+        fn.dependencies = list(aliases)
+        return fn
+    return decorator
+
+
+def x_after_y(x, y, aliases, dates):
+    """
+    rf.x_after_y on the rows that are not already known to be in order, i.e. all but those whose x parsed to a later
+    date than their y through the cache, the library compares the others (missing, unparsable, equal or reversed
+    dates, or dates out of the range of the cache) and remains the source of their violations
+    """
+    rule = rf.x_after_y(x, y, aliases)
+
+    def fn(data_model: DataModel) -> List[Violation]:
+        rows = {}
+        for alias in aliases:
+            df = data_model[alias]
+            x_dates, _ = dates.parse(alias, x, df[x])
+            y_dates, _ = dates.parse(alias, y, df[y])
+            rows[alias] = df.index[~(x_dates > y_dates)]  # comparisons with NaT are False
+        return rule(RowSubset(data_model, rows))
+    return fn
+
+
+def uses_network(fn):
+    """
+    mark a rule that resolves identifiers through remote apis
+    """
+    fn.network = True
+    return fn
+
+
 class CommonRuleArray:
     """
     rules in common to all habitats
     """
-    def __init__(self, habitat):
+    def __init__(self, habitat, cache_path=None, dates=None):
         self.aliases_measured = ["sm"] if habitat == "sediment" else ["wm"] if habitat == "water" else ["sm", "wm"]
         self.aliases_observatory = ["so"] if habitat == "sediment" else ["wo"] if habitat == "water" else ["so", "wo"]
         self.aliases_sampling = ["ss"] if habitat == "sediment" else ["ws"] if habitat == "water" else ["ss", "ws"]
 
+        # lookups of external identifiers, persisted across runs when a cache_path is given
+        if TAXONOMY_INDEX:
+            self.taxonomy_resolver = TaxonomyIndex(TAXONOMY_INDEX)
+        else:
+            self.taxonomy_resolver = TaxonomyResolver(
+                cache=LookupCache(cache_path / "taxonomy.json") if cache_path else None
+            )
+        self.orcid_resolver = OrcidResolver(
+            cache=LookupCache(cache_path / "orcid.json") if cache_path else None
+        )
+
+        dates = dates if dates is not None else DateCache()  # parsed date columns, shared with the schema types
+
         # rule factory
         self.biomass = rf.regex("biomass", r"^(.+\s+\d+\.?\d*E?[-|+]?\d*;?\s*)+$", self.aliases_measured)
         self.chem_administration = rf.regex("chem_administration", r"^(CHEBI:\d{5}\s+\d{4}-\d{2}-\d{2};?\s*)+$", self.aliases_measured)
-        self.ship_date_after_samp_store_date = rf.x_after_y("ship_date", "samp_store_date", self.aliases_sampling)
-        self.ship_date_seq_after_ship_date = rf.x_after_y("ship_date_seq", "ship_date", self.aliases_sampling)
-        self.arr_date_hq_after_ship_date = rf.x_after_y("arr_date_hq", "ship_date", self.aliases_sampling)
-        self.arr_date_seq_after_arr_date_hq = rf.x_after_y("arr_date_seq", "arr_date_hq", self.aliases_sampling)
-        self.arr_date_seq_after_ship_date_seq = rf.x_after_y("arr_date_seq", "ship_date_seq", self.aliases_sampling)
+        self.ship_date_after_samp_store_date = x_after_y("ship_date", "samp_store_date", self.aliases_sampling, dates)
+        self.ship_date_seq_after_ship_date = x_after_y("ship_date_seq", "ship_date", self.aliases_sampling, dates)
+        self.arr_date_hq_after_ship_date = x_after_y("arr_date_hq", "ship_date", self.aliases_sampling, dates)
+        self.arr_date_seq_after_arr_date_hq = x_after_y("arr_date_seq", "arr_date_hq", self.aliases_sampling, dates)
+        self.arr_date_seq_after_ship_date_seq = x_after_y("arr_date_seq", "ship_date_seq", self.aliases_sampling, dates)
 
         # one-offs
-        def depth(data_model: DataModel) -> List[Violation]:
+        @depends_on(self.aliases_observatory)  # tot_depth_water_col
+        def depth(data_model: DataModel) -> ViolationBatch:
             violations = []
             for alias_observatory, alias_sampling in zip(self.aliases_observatory, self.aliases_sampling):
                 dfo = data_model[alias_observatory]
                 dfs = data_model[alias_sampling]
                 tot_depth_water_col = dfo.at[0, "tot_depth_water_col"]
-                for index, row in dfs.iterrows():
-                    if not data_model.isna(row["depth"]):
-                        if row["depth"] > tot_depth_water_col:  # TODO absolute value?
-                            violations.append(
-                                Violation(
-                                    diagnosis="illegal depth",
-                                    table=alias_sampling,
-                                    column="depth",
-                                    row=index + 1,
-                                    value=row["depth"],
-                                    extended_diagnosis=f"depth must be less than or equal to tot_depth_water_col ({tot_depth_water_col})",
-                                ),
-                            )
-            return violations
+                depth = as_strings(dfs["depth"])
+                mask = ~isna_mask(data_model, depth) & (depth > tot_depth_water_col).astype(bool)  # TODO absolute value?
+                violations.append(
+                    ViolationBatch(
+                        diagnosis="illegal depth",
+                        table=alias_sampling,
+                        column="depth",
+                        row=depth.index[mask] + 1,
+                        value=depth[mask],
+                        extended_diagnosis=f"depth must be less than or equal to tot_depth_water_col ({tot_depth_water_col})",
+                    ),
+                )
+            return ViolationBatch.concat(violations)
         
         self.depth = depth
         
-        def source_mat_id(data_model: DataModel) -> List[Violation]:
+        @depends_on(self.aliases_observatory)  # so_id, wa_id
+        def source_mat_id(data_model: DataModel) -> ViolationBatch:
             violations = []
             for alias in self.aliases_sampling:
                 df = data_model[alias]
-                for index, row in df.iterrows():
-                    def add_violation(message: str) -> None:
-                        violations.append(
-                            Violation(
-                                diagnosis="source_mat_id error",
-                                table=alias,
-                                column="source_mat_id",
-                                row=index + 1,
-                                value=row["source_mat_id"],
-                                extended_diagnosis=message,
-                            )
-                        )
-                        
-                    if not data_model.isna(row["source_mat_id"]):
-                        collection_date = row["collection_date"][2:10].replace("-", "")
-                        if alias.startswith("s"):
-                            so_id = data_model["so"].at[0, "so_id"].replace(" ", "_")
-                            pattern = f'^EMOBON_{so_id}_{collection_date}_{row["comm_samp"]}_{row["replicate"]}$'
-                        else:
-                            wa_id = data_model["wo"].at[0, "wa_id"].replace(" ", "_")
-                            if str(row["size_frac_up"]).endswith(".0"):
-                                size_frac_up = str(row["size_frac_up"])[:-2]
-                            else:
-                                size_frac_up = row["size_frac_up"]
-                            pattern = f'^EMOBON_{wa_id}_{collection_date}_{size_frac_up}um_{row["replicate"]}$'
-                        if not re.match(pattern, row["source_mat_id"]):
-                            add_violation(f"source_mat_id should match {pattern}")
-                    else:   # source_mat_id is missing
-                        add_violation("source_mat_id is missing")  
-
-            return violations
+                values = df["source_mat_id"]
+                missing = isna_mask(data_model, values)
+                mismatch = pd.Series(False, index=df.index)
+                patterns = pd.Series("", index=df.index)
+                if not missing.all():
+                    collection_date = df["collection_date"].str[2:10].str.replace("-", "", regex=False)
+                    if alias.startswith("s"):
+                        so_id = data_model["so"].at[0, "so_id"].replace(" ", "_")
+                        expected = f"EMOBON_{so_id}_" + collection_date + "_" + as_strings(df["comm_samp"]) + "_" + as_strings(df["replicate"])
+                    else:
+                        wa_id = data_model["wo"].at[0, "wa_id"].replace(" ", "_")
+                        size_frac_up = df["size_frac_up"].astype(str)
+                        size_frac_up = size_frac_up.where(~size_frac_up.str.endswith(".0"), size_frac_up.str[:-2])
+                        expected = f"EMOBON_{wa_id}_" + collection_date + "_" + size_frac_up + "um_" + as_strings(df["replicate"])
+                    patterns = "^" + expected + "$"
+                    # the expected id is not escaped in its pattern, so only identical ids without regex metacharacters are known to match
+                    literal = ~expected.str.contains(r"[\\^$*+?{}\[\]|()]")
+                    undecided = ~missing & ~(literal & (values == expected))
+                    for index in df.index[undecided]:
+                        mismatch[index] = not re.match(patterns[index], values[index])
+                flagged = missing | mismatch
+                violations.append(
+                    ViolationBatch(
+                        diagnosis="source_mat_id error",
+                        table=alias,
+                        column="source_mat_id",
+                        row=df.index[flagged] + 1,
+                        value=values[flagged],
+                        extended_diagnosis=("source_mat_id should match " + patterns[flagged]).where(
+                            mismatch[flagged], "source_mat_id is missing"
+                        ),
+                    )
+                )
+            return ViolationBatch.concat(violations)
         
         self.source_mat_id = source_mat_id
         
-        def tax_id_versus_scientific_name(data_model: DataModel) -> List[Violation]:
-            tax_id2scientific_name = {}
+        def tax_id_versus_scientific_name(data_model: DataModel) -> ViolationBatch:
             violations = []
+            records = []  # (alias, tax_ids, scientific names) of the rows that have both
             for alias in self.aliases_sampling:
                 df = data_model[alias]
-                for index, row in df.iterrows():
-                    if not data_model.isna(row["tax_id"]) and not data_model.isna(row["scientific_name"]):
-                        tax_id = row["tax_id"]
-                        if not tax_id in tax_id2scientific_name.keys():
-                            uri = uritemplate.expand(
-                                "https://www.ncbi.nlm.nih.gov/Taxonomy/Browser/wwwtax.cgi?id={tax_id}",
-                                {"tax_id": tax_id}
-                            )
-                            r = requests.get(uri)
-                            soup = BeautifulSoup(r.text, "html.parser")
-                            scientific_name = soup.title.string.split("(")[1][:-1]
-                            tax_id2scientific_name.update({tax_id: scientific_name})  # TODO handle the case where the scientific name could not be retrieved
-                        if tax_id2scientific_name[tax_id] != row["scientific_name"]:
-                            violations.append(
-                                Violation(
-                                    diagnosis="scientific name error",
-                                    table=alias,
-                                    column="scientific_name",
-                                    row=index + 1,
-                                    value=row["scientific_name"],
-                                    extended_diagnosis=f"scientific_name should be {tax_id2scientific_name[tax_id]}",
-                                )
-                            )
-                    elif data_model.isna(row["tax_id"]) and data_model.isna(row["scientific_name"]):
-                        pass
-                    else:
-                        raise AssertionError
-            return violations
+                missing_tax_id = isna_mask(data_model, df["tax_id"])
+                missing_scientific_name = isna_mask(data_model, df["scientific_name"])
+                one = missing_tax_id ^ missing_scientific_name
+                missing = np.where(missing_tax_id[one], "tax_id", "scientific_name").astype(object)
+                violations.append(
+                    ViolationBatch(
+                        diagnosis="scientific name error",
+                        table=alias,
+                        column=missing,
+                        row=df.index[one] + 1,
+                        value=np.where(
+                            missing_tax_id[one],
+                            as_strings(df["tax_id"])[one].to_numpy(dtype=object),
+                            as_strings(df["scientific_name"])[one].to_numpy(dtype=object),
+                        ),
+                        extended_diagnosis=missing + ", tax_id and scientific_name are provided together",
+                    )
+                )
+                both = ~missing_tax_id & ~missing_scientific_name
+                records.append((alias, as_strings(df["tax_id"])[both], as_strings(df["scientific_name"])[both]))
+            tax_id2scientific_name = self.taxonomy_resolver.resolve(
+                tax_id for _, tax_ids, _ in records for tax_id in tax_ids
+            )
+            for alias, tax_ids, scientific_names in records:
+                expected = tax_ids.map(tax_id2scientific_name)  # NaN when the lookup failed, logged by the resolver
+                unresolved(alias, tax_ids.index[expected.isna()])
+                mismatch = expected.notna() & (expected != scientific_names)
+                violations.append(
+                    ViolationBatch(
+                        diagnosis="scientific name error",
+                        table=alias,
+                        column="scientific_name",
+                        row=tax_ids.index[mismatch] + 1,
+                        value=scientific_names[mismatch],
+                        extended_diagnosis="scientific_name should be " + expected[mismatch].astype(str),
+                    )
+                )
+                skipped = tax_ids.isin(self.taxonomy_resolver.skipped)  # the time budget ran out before the lookup
+                if skipped.any():
+                    violations.append(
+                        unverified(
+                            alias,
+                            "scientific_name",
+                            (tax_ids.index[skipped] + 1).tolist(),
+                            scientific_names[skipped].tolist(),
+                            f"scientific_name of tax_id {tax_ids[skipped].iloc[0]}",
+                        )
+                    )
+            return ViolationBatch.concat(violations)
         
+        if not TAXONOMY_INDEX:
+            tax_id_versus_scientific_name = uses_network(tax_id_versus_scientific_name)
         self.tax_id_versus_scientific_name = tax_id_versus_scientific_name
         
+        orcid_columns = [
+            ("contact_orcid", "contact_name", self.aliases_observatory),
+            ("other_person_orcid", "other_person", self.aliases_sampling),
+            ("sampl_person_orcid", "sampl_person", self.aliases_sampling),
+            ("store_person_orcid", "store_person", self.aliases_sampling),
+        ]
+
+        def resolve_orcids(data_model: DataModel) -> Dict[str, str]:
+            # the orcids of all orcid columns are resolved at once, the other orcid rules are served from memory
+            orcids = []
+            for person_orcid, person_name, aliases in orcid_columns:
+                for alias in aliases:
+                    df = data_model[alias]
+                    for value_orcid, value_name in zip(df[person_orcid], df[person_name]):
+                        if not data_model.isna(value_orcid) and not data_model.isna(value_name):
+                            orcids.append(value_orcid)
+            return self.orcid_resolver.resolve(orcids)
+
         def orcid(person_orcid, person_name, aliases):
-            def fn(data_model: DataModel):
-                orcid2name = {}
+            @uses_network
+            def fn(data_model: DataModel) -> ViolationBatch:
+                orcid2name = resolve_orcids(data_model)
                 violations = []
                 for alias in aliases:
                     df = data_model[alias]
-                    for index, row in df.iterrows():
-                        if not data_model.isna(row[person_orcid]):
-                            if not data_model.isna(row[person_name]):
-                                if not row[person_orcid] in orcid2name.keys():
-                                    uri = uritemplate.expand(
-                                        "https://pub.orcid.org/v3.0/{orcid}",
-                                        {"orcid": row[person_orcid]},
-                                    )
-                                    r = requests.get(uri, headers={"Accept": "application/json"})
-                                    if r.status_code == 200:
-                                        r = r.json()["person"]["name"]
-                                        name = r["given-names"]["value"] + " " + r["family-name"]["value"]
-                                        orcid2name.update({row[person_orcid]: name})
-                                    else:
-                                        logger.error(f"orcid api failure for {row[person_orcid]}")
-                                if (row[person_orcid] in orcid2name.keys()) and (orcid2name[row[person_orcid]] != row[person_name]): 
-                                    violations.append(
-                                        Violation(
-                                            diagnosis="orcid error",
-                                            table=alias,
-                                            column=person_name,
-                                            row=index + 1,
-                                            value=row[person_name],
-                                            extended_diagnosis=f"orcid {row[person_orcid]} corresponds to person name {orcid2name[row[person_orcid]]}",
-                                        )
-                                    )
-                            else:
-                                violations.append(
-                                    Violation(
-                                        diagnosis="orcid error",
-                                        table=alias,
-                                        column=person_orcid,
-                                        row=index + 1,
-                                        value=row[person_orcid],
-                                        extended_diagnosis=f"no person name was provided for this orcid",
-                                    )
-                                )
-                return violations
+                    orcids = as_strings(df[person_orcid])
+                    names = as_strings(df[person_name])
+                    has_orcid = ~isna_mask(data_model, orcids)
+                    has_name = ~isna_mask(data_model, names)
+                    expected = orcids.map(orcid2name)  # NaN when the lookup failed, logged by the resolver
+                    unresolved(alias, df.index[has_orcid & has_name & expected.isna()])
+                    mismatch = has_orcid & has_name & expected.notna() & (expected != names)
+                    flagged = mismatch | (has_orcid & ~has_name)  # in the order of the rows
+                    is_mismatch = mismatch[flagged].to_numpy()
+                    violations.append(
+                        ViolationBatch(
+                            diagnosis="orcid error",
+                            table=alias,
+                            column=np.where(is_mismatch, person_name, person_orcid).astype(object),
+                            row=df.index[flagged] + 1,
+                            value=np.where(
+                                is_mismatch,
+                                names[flagged].to_numpy(dtype=object),
+                                orcids[flagged].to_numpy(dtype=object),
+                            ),
+                            extended_diagnosis=np.where(
+                                is_mismatch,
+                                (
+                                    "orcid " + orcids[flagged] + " corresponds to person name "
+                                    + expected[flagged].fillna("").astype(str)
+                                ).to_numpy(dtype=object),
+                                "no person name was provided for this orcid",
+                            ),
+                        )
+                    )
+                    # the time budget ran out before the lookup
+                    skipped = has_orcid & has_name & ~mismatch & orcids.isin(self.orcid_resolver.skipped)
+                    if skipped.any():
+                        violations.append(
+                            unverified(
+                                alias,
+                                person_name,
+                                (df.index[skipped] + 1).tolist(),
+                                names[skipped].tolist(),
+                                f"person name of orcid {orcids[skipped].iloc[0]}",
+                            )
+                        )
+                return ViolationBatch.concat(violations)
             return fn
             
         self.contact_orcid = orcid("contact_orcid", "contact_name", aliases=self.aliases_observatory)
@@ -180,84 +337,56 @@ class CommonRuleArray:
         self.sampl_person_orcid = orcid("sampl_person_orcid", "sampl_person", aliases=self.aliases_sampling)
         self.store_person_orcid = orcid("store_person_orcid", "store_person", aliases=self.aliases_sampling)
 
-        def organization_edmoid(data_model: DataModel) -> List[Violation]:
+        def organization_edmoid(data_model: DataModel) -> ViolationBatch:
             prefix = "https://edmo.seadatanet.org/report/"
             violations = []
             for alias in self.aliases_observatory:
                 df = data_model[alias]
-                for index, row in df.iterrows():
-                    edmo = row["organization_edmoid"]
-                    if not data_model.isna(edmo):
-                        # TODO handle the case where the input is already repaired (i.e. a list of URIs)
-                        try:
-                            repair = ";".join([f"{prefix}{int(i.strip())}" for i in edmo.split(";")])  # int conversion to assert the input is a list of integers
-                            violations.append(
-                                Violation(
-                                    diagnosis="organization edmoid error",
-                                    table=alias,
-                                    column="organization_edmoid",
-                                    row=index + 1,
-                                    value=edmo,
-                                    extended_diagnosis="organization edmoid should be a list of URIs",
-                                    repair=repair,
-                                )
-                            )
-                        except ValueError:
-                            violations.append(
-                                Violation(
-                                    diagnosis="organization edmoid error",
-                                    table=alias,
-                                    column="organization_edmoid",
-                                    row=index + 1,
-                                    value=edmo,
-                                    extended_diagnosis="organization edmoid should be a list of URIs",
-                                )
-                            )
-            return violations
+                edmo = df["organization_edmoid"]
+                edmo = edmo[~isna_mask(data_model, edmo)]
+                # TODO handle the case where the input is already repaired (i.e. a list of URIs)
+                numbers = to_integer_strings(edmo.str.split(";").explode().str.strip())  # int conversion to assert the input is a list of integers
+                valid = numbers.notna().groupby(level=0).all()
+                repairs = join_exploded(prefix + numbers.fillna("")).where(valid, None)
+                violations.append(
+                    ViolationBatch(
+                        diagnosis="organization edmoid error",
+                        table=alias,
+                        column="organization_edmoid",
+                        row=edmo.index + 1,
+                        value=edmo,
+                        extended_diagnosis="organization edmoid should be a list of URIs",
+                        repair=repairs.reindex(edmo.index),
+                    )
+                )
+            return ViolationBatch.concat(violations)
     
         self.organization_edmoid = organization_edmoid
 
         def envo(column, aliases):
-            def fn(data_model: DataModel) -> List[Violation]:
+            def fn(data_model: DataModel) -> ViolationBatch:
                 prefix = "http://purl.obolibrary.org/obo/ENVO_"
                 violations = []
                 for alias in aliases:
                     df = data_model[alias]
-                    for index, row in df.iterrows():
-                        envo = row[column]
-                        if not data_model.isna(envo):
-                            # TODO handle the case where the input is already repaired (i.e. a list of URIs)
-                            try:
-                                accession_numbers = [term.strip().split('[ENVO')[-1][1:-1] for term in envo.split(";")]
-                                for an in accession_numbers:
-                                    try:
-                                        int(an)
-                                    except:
-                                        raise AssertionError
-                                repair = ";".join([f"{prefix}{an}" for an in accession_numbers])
-                                violations.append(
-                                    Violation(
-                                        diagnosis="envo term error",
-                                        table=alias,
-                                        column=column,
-                                        row=index + 1,
-                                        value=envo,
-                                        extended_diagnosis="envo term should be a list of URIs",
-                                        repair=repair,
-                                    )
-                                )
-                            except (ValueError, IndexError, AssertionError):
-                                violations.append(
-                                    Violation(
-                                        diagnosis="envo term error",
-                                        table=alias,
-                                        column=column,
-                                        row=index + 1,
-                                        value=envo,
-                                        extended_diagnosis="envo term should be a list of URIs",
-                                    )
-                                )
-                return violations
+                    envo = df[column]
+                    envo = envo[~isna_mask(data_model, envo)]
+                    # TODO handle the case where the input is already repaired (i.e. a list of URIs)
+                    accession_numbers = envo.str.split(";").explode().str.strip().str.rsplit("[ENVO", n=1).str[-1].str[1:-1]
+                    valid = to_integer_strings(accession_numbers).notna().groupby(level=0).all()
+                    repairs = join_exploded(prefix + accession_numbers).where(valid, None)
+                    violations.append(
+                        ViolationBatch(
+                            diagnosis="envo term error",
+                            table=alias,
+                            column=column,
+                            row=envo.index + 1,
+                            value=envo,
+                            extended_diagnosis="envo term should be a list of URIs",
+                            repair=repairs.reindex(envo.index),
+                        )
+                    )
+                return ViolationBatch.concat(violations)
             return fn
     
         self.env_broad_biome = envo("env_broad_biome", aliases=self.aliases_observatory)
@@ -287,20 +416,59 @@ class WaterRuleArray:
         ...
 
 
-def generate_rules(habitat):
+def as_batch(fn):
+    """
+    wrap a rule so that it returns a ViolationBatch, the rules of the library return lists of Violation objects
+    """
+    @wraps(fn)
+    def wrapper(data_model: DataModel) -> ViolationBatch:
+        result = fn(data_model)
+        if isinstance(result, ViolationBatch):
+            return result
+        return ViolationBatch.from_violations(result)
+    return wrapper
+
+
+def record_violations(fn, violations=None):
+    """
+    wrap a rule for the engine, the batch of violations it returns is appended to a ViolationBuffer (if any)
+    and handed to the engine as Violation objects
+    """
+    @wraps(fn)
+    def wrapper(data_model: DataModel) -> List[Violation]:
+        result = fn(data_model)
+        if violations is not None:
+            violations.append(result)
+        return result.to_violations()
+    return wrapper
+
+
+def generate_rule_arrays(habitat, cache_path=None, dates=None):
     assert habitat in ("all", "sediment", "water")
     
     if habitat == "sediment":
-        rule_arrays = [CommonRuleArray(habitat), SedimentRuleArray()]
+        return [CommonRuleArray(habitat, cache_path, dates), SedimentRuleArray()]
     if habitat == "water":
-        rule_arrays = [CommonRuleArray(habitat), WaterRuleArray()]
+        return [CommonRuleArray(habitat, cache_path, dates), WaterRuleArray()]
     if habitat == "all":
-        rule_arrays = [CommonRuleArray(habitat), SedimentRuleArray(), WaterRuleArray()]
+        return [CommonRuleArray(habitat, cache_path, dates), SedimentRuleArray(), WaterRuleArray()]
+
+
+def generate_rules(habitat, cache_path=None, violations=None, wrappers=(), dates=None, rule_arrays=None):
+    """
+    rules of a habitat for the engine, each appends the batch of its violations to the violations buffer (if any)
+    when called, rule_arrays: those of an earlier run to reuse, with their warm lookup resolvers
+    """
+    if rule_arrays is None:
+        rule_arrays = generate_rule_arrays(habitat, cache_path, dates)
 
     rules = []
     for array in rule_arrays:
         for name, value in getmembers(array, isfunction):
             if not name.startswith("__"):
-                rules.append(Rule(value, name))
+                value = as_batch(value)
+                for wrapper in wrappers:
+                    value = wrapper(value, name)
+                rules.append(record_violations(value, violations))
 
     return rules
@@ -0,0 +1,59 @@
+"""
+concurrent execution of independent rules
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from py_data_rules.data_model import DataModel
+from .violations import ViolationBatch
+
+logger = logging.getLogger(__name__)
+
+
+class RuleScheduler:
+    """
+    the first rule called starts all rules at once, network-bound rules on their own pool so they never hold up
+    the others, every result is then collected in the (serial) order the rules are called in
+    """
+    def __init__(self, aliases, workers=4, network_workers=None):
+        self.aliases = list(aliases)
+        self.workers = workers
+        self.network_workers = network_workers or workers
+        self.rules = []  # (name, fn)
+        self.futures = None
+        self.pools = []
+        self.lock = threading.Lock()
+
+    def wrap(self, fn, name):
+        key = len(self.rules)
+        self.rules.append((name, fn))
+
+        @wraps(fn)
+        def wrapper(data_model: DataModel) -> ViolationBatch:
+            self.start(data_model)
+            return self.futures[key].result()
+        return wrapper
+
+    def start(self, data_model: DataModel):
+        with self.lock:
+            if self.futures is not None:
+                return
+            for alias in self.aliases:  # read all tables up front rather than racing on the readers
+                data_model[alias]
+            network_pool = ThreadPoolExecutor(self.network_workers, thread_name_prefix="network-rule")
+            pool = ThreadPoolExecutor(self.workers, thread_name_prefix="rule")
+            self.pools = [network_pool, pool]
+            self.futures = {}
+            for key, (name, fn) in sorted(
+                enumerate(self.rules), key=lambda item: not getattr(item[1][1], "network", False)
+            ):
+                if getattr(fn, "network", False):
+                    self.futures[key] = network_pool.submit(fn, data_model)
+                else:
+                    self.futures[key] = pool.submit(fn, data_model)
+            logger.info(f"scheduled {len(self.rules)} rules on {self.workers} workers")
+
+    def shutdown(self):
+        for pool in self.pools:
+            pool.shutdown(wait=True)
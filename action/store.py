@@ -0,0 +1,57 @@
+"""
+in-memory handoff of the logsheets between the stages of a run
+"""
+import logging
+from functools import wraps
+from pathlib import Path
+from .compact import compact_frame, frame_bytes
+from .extensions import read_emobon_csv
+
+logger = logging.getLogger(__name__)
+
+
+class TableStore:
+    """
+    filtered and normalized logsheets by base name, each raw sheet is parsed once per run
+    and the csv files are only written as outputs, optionally held as compact frames
+    """
+    def __init__(self, compact=False):
+        self.tables = {}  # base name -> DataFrame
+        self.compact = compact
+        self.pool = {}  # interned strings shared by the compact frames
+        self.sizes = {}  # base name -> bytes before and after compaction
+
+    def __contains__(self, base_name):
+        return base_name in self.tables
+
+    def __getitem__(self, base_name):
+        return self.tables[base_name]
+
+    def __setitem__(self, base_name, df):
+        if self.compact:
+            before = frame_bytes(df)
+            df = compact_frame(df, self.pool)
+            self.sizes[base_name] = (before, frame_bytes(df))
+        self.tables[base_name] = df
+
+    def reader(self, fallback=read_emobon_csv):
+        """
+        reader serving the logsheets from memory, those not in the store are read from file once
+        """
+        @wraps(fallback)
+        def reader(path):
+            base_name = Path(path).stem
+            if base_name not in self.tables:
+                self[base_name] = fallback(path)
+            return self.tables[base_name]
+        return reader
+
+    def log_memory(self):
+        if not self.sizes:
+            return
+        lines = ["memory of the logsheets (before -> after compaction):"]
+        for base_name, (before, after) in self.sizes.items():
+            lines.append(f"  {base_name}: {before / 2**20:.1f} MB -> {after / 2**20:.1f} MB")
+        before, after = (sum(sizes) for sizes in zip(*self.sizes.values()))
+        lines.append(f"  total: {before / 2**20:.1f} MB -> {after / 2**20:.1f} MB")
+        logger.info("\n".join(lines))
@@ -0,0 +1,176 @@
+"""
+bounded-memory data quality control, the logsheets are filtered, controlled, repaired and written in row chunks
+"""
+import logging
+from functools import wraps
+import numpy as np
+import pandas as pd
+from py_data_rules.data_model import DataModel
+from py_data_rules.rule_engine import RuleEngine
+from .data_model import generate_data_model, generate_schema_columns, prime_data_types
+from .dates import DateCache
+from .extensions import normalize_emobon_frame
+from .pipeline import Pipeline
+from .rules import generate_rules
+from .violations import ViolationBatch, ViolationBuffer
+
+logger = logging.getLogger(__name__)
+
+
+def hash_ids(values):
+    """
+    64-bit hashes of the source_mat_ids, the ids of a sheet are kept as a sorted array of these
+    """
+    return pd.util.hash_array(np.asarray(values, dtype=object))
+
+
+class SideTables:
+    """
+    view on a chunk of the data model that exposes the full observatory tables
+    """
+    def __init__(self, data_model, tables):
+        self.data_model = data_model
+        self.tables = tables  # alias -> DataFrame
+
+    def __getitem__(self, alias):
+        if alias in self.tables:
+            return self.tables[alias]
+        return self.data_model[alias]
+
+    def __getattr__(self, name):
+        return getattr(self.data_model, name)
+
+
+class ChunkedControl:
+    """
+    the rules and the engine run once per chunk of a single logsheet, the other logsheets are empty at that time,
+    so peak memory follows from chunk_rows rather than from the length of the logsheets
+
+    the observatory sheets (a single row) are kept in memory as side tables for the rules that depend on them,
+    the filtered sampling ids as sorted hashes for filtering the measured sheets
+    """
+    def __init__(
+        self, crate, habitat, alias2basename, threshold_date, schema_config, sink, cache_path=None, chunk_rows=50000, wrappers=()
+    ):
+        self.crate = crate
+        self.alias2basename = alias2basename
+        self.threshold_date = threshold_date
+        self.columns = generate_schema_columns(schema_config)  # the data types are primed chunk by chunk
+        self.dates = DateCache()
+        self.chunk_rows = chunk_rows
+        self.sink = sink  # writes dqc.csv and report.csv
+        self.violations = ViolationBuffer()  # violations of the current chunk
+        self.rules = generate_rules(
+            habitat, cache_path=cache_path, violations=self.violations, wrappers=[*wrappers, self.wrap]
+        )
+        self.tables = {}  # alias -> current chunk, empty for the logsheets not being controlled
+        self.side_tables = {}  # alias -> observatory
+        self.source_mat_ids = {}  # habitat -> sorted hashes of the filtered sampling ids
+        self.headers = {}  # alias -> empty frame with the columns of the logsheet
+        self.started = set()  # paths written to so far
+
+    def wrap(self, fn, name):
+        dependencies = getattr(fn, "dependencies", [])
+
+        @wraps(fn)
+        def wrapper(data_model: DataModel) -> ViolationBatch:
+            if dependencies:
+                data_model = SideTables(data_model, {alias: self.side_tables[alias] for alias in dependencies})
+            return fn(data_model)
+        return wrapper
+
+    def read(self, path):
+        alias = next(alias for alias, base_name in self.alias2basename.items() if base_name == path.stem)
+        return self.tables[alias]
+
+    def append(self, df, path):
+        """
+        write the first chunk with its header and append the others
+        """
+        first = path not in self.started
+        df.to_csv(path, index=False, header=first, mode="w" if first else "a")
+        self.started.add(path)
+
+    def control(self, alias, df):
+        """
+        filtered chunk -> normalize -> rules -> repair -> transformed chunk
+        """
+        base_name = self.alias2basename[alias]
+        df = normalize_emobon_frame(df)
+        self.tables = {**self.headers, alias: df}
+        data_model = generate_data_model(
+            logsheets_path=self.crate.logsheets_filtered_path,
+            alias2basename=self.alias2basename,
+            reader=self.read,
+            columns=self.columns,
+        )
+        prime_data_types(data_model, self.alias2basename, self.columns, self.dates)
+        self.violations.clear()
+        chunk_path = self.crate.dqc_path / "dqc.chunk.csv"
+        RuleEngine(data_model=data_model, rules=self.rules).execute(report_path=chunk_path)
+        self.violations.read_dqc(chunk_path)
+        chunk_path.unlink(missing_ok=True)
+        self.sink.consume_buffer(self.violations)
+
+        pipeline = Pipeline(
+            input_path=self.crate.logsheets_filtered_path,
+            output_path=self.crate.logsheets_transformed_path,
+            violations=self.violations,
+            alias2basename={alias: base_name},
+        )
+        pipeline.dfs = {alias: df}
+        pipeline.quick_fix()
+        self.append(pipeline.dfs[alias], self.crate.logsheets_transformed_path / f"{base_name}.csv")
+
+    def chunks(self, base_name):
+        return pd.read_csv(
+            self.crate.logsheets_path / f"{base_name}.csv",
+            dtype=object,
+            keep_default_na=False,
+            chunksize=self.chunk_rows,
+        )
+
+    def filter_chunk(self, alias, df):
+        habitat = self.alias2basename[alias].split("_")[0]
+        if alias[1] == "s":
+            df.loc[pd.to_datetime(df["collection_date"]) >= self.threshold_date] = ""
+            self.source_mat_ids[habitat] = np.union1d(
+                self.source_mat_ids.get(habitat, np.array([], dtype="uint64")), hash_ids(df["source_mat_id"])
+            )
+        elif alias[1] == "m":
+            df.loc[~np.isin(hash_ids(df["source_mat_id"]), self.source_mat_ids[habitat])] = ""
+        return df
+
+    def run(self):
+        for alias, base_name in self.alias2basename.items():
+            header = pd.read_csv(self.crate.logsheets_path / f"{base_name}.csv", dtype=object, nrows=0)
+            self.headers[alias] = pd.DataFrame(columns=header.columns, dtype=object)
+
+        # the observatory sheets are read in full first, the rules on the other sheets depend on them
+        observatory = {}
+        for alias in self.alias2basename:
+            if alias[1] == "o":
+                base_name = self.alias2basename[alias]
+                df = pd.concat([self.headers[alias], *self.chunks(base_name)])
+                self.append(df, self.crate.logsheets_filtered_path / f"{base_name}.csv")
+                observatory[alias] = df
+                self.side_tables[alias] = normalize_emobon_frame(df)
+        for alias, df in observatory.items():
+            self.control(alias, df)
+
+        # then sampling, whose ids filter measured
+        for alias in sorted(self.alias2basename, key=lambda alias: "sm".find(alias[1])):
+            if alias[1] == "o":
+                continue
+            base_name = self.alias2basename[alias]
+            filtered_path = self.crate.logsheets_filtered_path / f"{base_name}.csv"
+            rows = 0
+            for df in self.chunks(base_name):
+                df = self.filter_chunk(alias, df)
+                self.append(df, filtered_path)
+                self.control(alias, df)
+                rows += len(df)
+            if filtered_path not in self.started:  # no rows, only the header is written
+                self.append(self.headers[alias], filtered_path)
+                self.control(alias, self.headers[alias])
+            logger.info(f"controlled {base_name} in chunks of {self.chunk_rows} rows ({rows} rows)")
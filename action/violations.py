@@ -0,0 +1,223 @@
+"""
+violations as column batches, the rules hand their violations to a buffer a batch at a time on their way to the engine,
+report.csv is then written from the dqc.csv of the engine in a single pass and the repairs are read from the buffer
+"""
+import numpy as np
+import pandas as pd
+from py_data_rules.violation import Violation
+from .report import DQC_COLUMNS
+
+VIOLATION_FIELDS = ["diagnosis", "table", "column", "row", "value", "extended_diagnosis", "repair"]  # those of a rule
+
+
+def to_cell(value):
+    """
+    csv cell of a value, as pandas writes it
+    """
+    if isinstance(value, str):
+        return value
+    if value is None or pd.isna(value):
+        return ""
+    return str(value)
+
+
+def object_array(values):
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def rows_array(rows):
+    try:
+        return np.asarray(rows, dtype=np.int64)
+    except (TypeError, ValueError):  # e.g. a violation without a row
+        return object_array(list(rows))
+
+
+class ViolationBatch:
+    """
+    violations in the layout of dqc.csv, each column is either a single value for all violations of the batch
+    or an array with a value per violation, the rows are numbered from 1
+    """
+    def __init__(
+        self,
+        diagnosis,
+        table,
+        column,
+        row,
+        value,
+        extended_diagnosis=None,
+        repair=None,
+        file_path=None,
+        data_type=None,
+        nullable=None,
+    ):
+        self.columns = {
+            "table": table,
+            "column": column,
+            "row": rows_array(row),
+            "value": value,
+            "diagnosis": diagnosis,
+            "extended_diagnosis": extended_diagnosis,
+            "repair": repair,
+            "file_path": file_path,
+            "data_type": data_type,
+            "nullable": nullable,
+        }
+        self.violations = None  # the Violation objects of a library rule the batch was made of
+        for name, values in self.columns.items():
+            if isinstance(values, (pd.Series, pd.Index)):
+                self.columns[name] = values.to_numpy(dtype=object)
+            elif isinstance(values, (list, tuple)):
+                self.columns[name] = object_array(values)
+
+    def __len__(self):
+        return len(self.columns["row"])
+
+    @classmethod
+    def empty(cls):
+        return cls(diagnosis=None, table=None, column=None, row=np.zeros(0, dtype=np.int64), value=None)
+
+    @classmethod
+    def from_violations(cls, violations):
+        """
+        batch of the Violation objects returned by a rule of the library, they are kept for the engine
+        """
+        batch = cls(**{field: [getattr(v, field) for v in violations] for field in VIOLATION_FIELDS})
+        batch.violations = violations
+        return batch
+
+    def to_violations(self):
+        """
+        Violation objects of the batch, as the engine takes them from a rule
+        """
+        if self.violations is not None:
+            return self.violations
+        return [
+            Violation(**dict(zip(VIOLATION_FIELDS, values)))
+            for values in zip(*(self.field(field).tolist() for field in VIOLATION_FIELDS))
+        ]
+
+    @classmethod
+    def concat(cls, batches):
+        batches = [batch for batch in batches if len(batch)]
+        if not batches:
+            return cls.empty()
+        if len(batches) == 1:
+            return batches[0]
+        columns = {}
+        for name in DQC_COLUMNS:
+            values = [batch.columns[name] for batch in batches]
+            if not any(isinstance(value, np.ndarray) for value in values) and len(set(values)) == 1:
+                columns[name] = values[0]
+            else:
+                columns[name] = np.concatenate([batch.field(name) for batch in batches])
+        return cls(**columns)
+
+    def field(self, name):
+        """
+        values of a column, one per violation
+        """
+        values = self.columns[name]
+        if isinstance(values, np.ndarray):
+            return values
+        return np.full(len(self), values, dtype=object)
+
+    def take(self, indices):
+        """
+        the violations at the given positions, or where the given mask is True
+        """
+        return ViolationBatch(
+            **{
+                name: values[indices] if isinstance(values, np.ndarray) else values
+                for name, values in self.columns.items()
+            }
+        )
+
+    def cells(self):
+        """
+        cells of the violations in dqc.csv, an array per column in the order of DQC_COLUMNS
+        """
+        cells = []
+        for name in DQC_COLUMNS:
+            values = self.columns[name]
+            if not isinstance(values, np.ndarray):
+                cells.append(np.full(len(self), to_cell(values), dtype=object))
+            elif values.dtype == np.int64:
+                cells.append(values.astype(str).astype(object))
+            else:
+                cells.append(object_array([to_cell(value) for value in values]))
+        return cells
+
+    def to_json(self):
+        """
+        the columns of a rule, e.g. for the manifest of an incremental run
+        """
+        return {
+            name: self.columns[name].tolist() if isinstance(self.columns[name], np.ndarray) else self.columns[name]
+            for name in VIOLATION_FIELDS
+        }
+
+    @classmethod
+    def from_json(cls, columns):
+        return cls(**columns)
+
+
+class ViolationBuffer:
+    """
+    violations of a run: the batches of the rules in the order they were called, and the dqc.csv the engine
+    wrote from them and from the violations it found validating the logsheets against their schema
+    """
+    def __init__(self):
+        self.batches = []
+        self.dqc = None  # ViolationBatch, once read from the dqc.csv of the engine
+
+    def __len__(self):
+        """
+        violations in the dqc.csv of the engine once read, those of the rules so far until then
+        """
+        if self.dqc is not None:
+            return len(self.dqc)
+        return sum(len(batch) for batch in self.batches)
+
+    def clear(self):
+        self.batches.clear()
+        self.dqc = None
+
+    def append(self, batch: ViolationBatch):
+        self.batches.append(batch)
+
+    def read_dqc(self, path):
+        """
+        the violations in the dqc.csv the engine wrote, in its order and with the cells it wrote
+        """
+        try:
+            df = pd.read_csv(path, dtype=str, keep_default_na=False)
+        except (FileNotFoundError, pd.errors.EmptyDataError):
+            df = pd.DataFrame(columns=DQC_COLUMNS)
+        df = df.reindex(columns=DQC_COLUMNS, fill_value="")
+        self.dqc = ViolationBatch(**{column: df[column].to_numpy(dtype=object) for column in DQC_COLUMNS})
+
+    def repairs(self):
+        """
+        table, column, row and repair of the violations of the rules that come with a repair
+        """
+        frames = []
+        for batch in self.batches:
+            if batch.columns["repair"] is None or not len(batch):
+                continue
+            repair = batch.field("repair")
+            mask = ~pd.isna(repair) & (repair != "")
+            frames.append(
+                pd.DataFrame(
+                    {
+                        "table": batch.field("table")[mask],
+                        "column": batch.field("column")[mask],
+                        "row": batch.field("row")[mask],
+                        "repair": repair[mask],
+                    }
+                )
+            )
+        if not frames:
+            return pd.DataFrame(columns=["table", "column", "row", "repair"])
+        return pd.concat(frames, ignore_index=True)
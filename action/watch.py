@@ -0,0 +1,130 @@
+"""
+watch mode, a crate is controlled again whenever one of its raw logsheets is saved, the state that does not depend
+on the logsheets (schema, data types and their matches, parsed dates, rules and lookup resolvers) is kept warm
+"""
+import logging
+import time
+from .crate import Crate, run_crate
+from .data_model import build_schema, fetch_schema_config, generate_schema_columns
+from .dates import DateCache
+from .rules import generate_rule_arrays
+
+logger = logging.getLogger(__name__)
+
+SHEETS = ("sampling", "measured", "observatory")
+
+
+class WarmState:
+    """
+    state shared by the runs of a long-running process, the logsheet schema is read once
+    """
+    def __init__(self, schema_config):
+        self.schema_config = schema_config
+        self.columns = generate_schema_columns(schema_config)  # data types memoize the values they matched, bounded
+        self.schemas = {key: build_schema(columns) for key, columns in self.columns.items()}
+        self.dates = DateCache()
+        self.arrays = {}  # habitat -> rule arrays
+        self.violations = {}  # habitat -> ViolationBuffer of its latest run
+
+    def rule_arrays(self, habitat, cache_path):
+        if habitat not in self.arrays:
+            self.arrays[habitat] = generate_rule_arrays(habitat, cache_path, self.dates)
+        else:  # lookups that failed in an earlier run are retried
+            self.arrays[habitat][0].orcid_resolver.failed.clear()
+        return self.arrays[habitat]
+
+    def other_violations(self, violations, habitat):
+        """
+        violation buffers of the other habitats controlled so far, the given buffer replaces that of the previous
+        run of the habitat
+        """
+        self.violations[habitat] = violations
+        return [buffer for other, buffer in self.violations.items() if other != habitat]
+
+
+def raw_signature(crate, habitat):
+    """
+    modification time and size of the raw logsheets of a habitat, None for those missing
+    """
+    signature = []
+    for sheet in SHEETS:
+        try:
+            stat = (crate.logsheets_path / f"{habitat}_{sheet}.csv").stat()
+        except FileNotFoundError:
+            signature.append(None)
+        else:
+            signature.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+class Watcher:
+    """
+    poll the raw logsheets of a crate every interval seconds, a habitat is controlled again once its logsheets
+    changed and then stayed unchanged for one interval (i.e. were saved), the other habitat is left as is
+    """
+    def __init__(self, workspace, sediment, water, threshold_date, interval=0.25, cache_path=None, **options):
+        self.crate = Crate(workspace)
+        self.habitats = [habitat for habitat, selected in (("sediment", sediment), ("water", water)) if selected]
+        assert self.habitats, "invalid logsheet_url configuration"
+        self.threshold_date = threshold_date
+        self.interval = interval
+        self.cache_path = cache_path or self.crate.dqc_path / "cache"
+        self.options = options
+        self.warm = WarmState(fetch_schema_config(self.cache_path))
+        self.seen = {}  # habitat -> raw signature of its latest run
+        self.pending = {}  # habitat -> raw signature of a change not controlled yet
+
+    def control(self, habitat):
+        self.seen[habitat] = raw_signature(self.crate, habitat)
+        start = time.perf_counter()
+        try:
+            result = run_crate(
+                self.crate.workspace,
+                sediment=habitat == "sediment",
+                water=habitat == "water",
+                threshold_date=self.threshold_date,
+                cache_path=self.cache_path,
+                warm=self.warm,
+                **self.options,
+            )
+        except Exception:  # e.g. a logsheet saved halfway, controlled again on its next save
+            logger.exception(f"control of the {habitat} logsheets failed")
+            return
+        logger.info(
+            f"{habitat} logsheets controlled in {time.perf_counter() - start:.2f}s, "
+            f"{result['report_rows']} violations reported"
+        )
+
+    def poll(self):
+        """
+        habitats whose raw logsheets were saved since their latest run
+        """
+        saved = []
+        for habitat in self.habitats:
+            signature = raw_signature(self.crate, habitat)
+            if signature == self.seen.get(habitat):
+                self.pending.pop(habitat, None)
+            elif signature == self.pending.get(habitat):
+                del self.pending[habitat]
+                saved.append(habitat)
+            else:
+                self.pending[habitat] = signature
+        return saved
+
+    def run(self, polls=None):
+        """
+        control all habitats, then each habitat again as its logsheets are saved, for the given number of polls
+        or until interrupted
+        """
+        for habitat in self.habitats:
+            self.control(habitat)
+        logger.info(f"watching {self.crate.logsheets_path}")
+        try:
+            while polls is None or polls > 0:
+                time.sleep(self.interval)
+                for habitat in self.poll():
+                    self.control(habitat)
+                if polls is not None:
+                    polls -= 1
+        except KeyboardInterrupt:
+            logger.info("stopped watching")
@@ -0,0 +1,117 @@
+"""
+local fake of the few github api endpoints used to notify the end user, see tests/test_notify.py
+"""
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlsplit
+from .stand_in import Server
+
+ISSUES = re.compile(r"/repos/(?P<repository>[^/]+/[^/]+)/issues(?:/(?P<number>\d+)(?P<comments>/comments)?)?")
+
+
+class Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status, body):
+        body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def route(self):
+        self.server.requests.append(f"{self.command} {self.path}")
+        match = ISSUES.fullmatch(urlsplit(self.path).path)
+        if match is None:
+            self.send_error(404)
+        return match
+
+    def do_GET(self):
+        match = self.route()
+        if match is None:
+            return
+        issues = self.server.issues.get(match["repository"], [])
+        if match["number"] is None:
+            assignee = parse_qs(urlsplit(self.path).query).get("assignee", [None])[0]
+            self.reply(200, [
+                issue for issue in reversed(issues)
+                if issue["state"] == "open" and (assignee is None or (issue["assignee"] or {}).get("login") == assignee)
+            ])
+        elif match["comments"] is None:
+            self.reply(200, issues[int(match["number"]) - 1])
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        match = self.route()
+        if match is None:
+            return
+        data = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        issues = self.server.issues.setdefault(match["repository"], [])
+        if match["number"] is None:
+            self.reply(201, self.server.add_issue(match["repository"], data["title"], data.get("body"), data.get("assignee")))
+        else:
+            issue = issues[int(match["number"]) - 1]
+            issue["comments"] += 1
+            comment = {"id": len(self.server.comments) + 1, "body": data["body"], "issue_url": issue["url"]}
+            self.server.comments.append(comment)
+            self.reply(201, comment)
+
+
+class GitHubServer(Server):
+    def add_issue(self, repository, title, body=None, assignee=None, pull_request=False):
+        """
+        open an issue, or a pull request, which the api lists among the issues
+        """
+        issues = self.issues.setdefault(repository, [])
+        host, port = self.server_address
+        number = len(issues) + 1
+        issue = {
+            "id": number,
+            "number": number,
+            "title": title,
+            "body": body,
+            "state": "open",
+            "assignee": {"login": assignee} if assignee else None,
+            "url": f"http://{host}:{port}/repos/{repository}/issues/{number}",
+            "comments": 0,
+        }
+        if pull_request:
+            issue["pull_request"] = {"url": f"http://{host}:{port}/repos/{repository}/pulls/{number}"}
+        issues.append(issue)
+        return issue
+
+
+class FakeGitHub:
+    """
+    serve the fake on a free local port for as long as the context is entered,
+    the issues, comments and requests are kept in memory
+    """
+    def __enter__(self):
+        self.server = GitHubServer(("127.0.0.1", 0), Handler)
+        self.server.issues = {}  # repository -> issues, by number
+        self.server.comments = []
+        self.server.requests = []
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    @property
+    def environment(self):
+        """
+        environment variables pointing the action at the fake, these are read when the action is imported
+        """
+        return {"GITHUB_API_URL": self.url}
@@ -0,0 +1,160 @@
+"""
+synthetic emobon crate workspaces for benchmarking
+"""
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+OBSERVATORY_ID = {"sediment": "BENCH SED", "water": "BENCH WAT"}
+TAX_IDS = ["9606", "10090", "7227", "6239", "3702", "4932", "562", "1280"]
+ORCIDS = [f"0000-0002-{i:04d}-{i % 10}00X" for i in range(50)]
+
+SCHEMA = [  # LogsheetType, LogsheetTab, LogsheetColumnTitle, DataTypeOut, Requirement
+    ("water sediment", "sampling", "source_mat_id", "xsd:string", "mandatory"),
+    ("water sediment", "sampling", "collection_date", "xsd:date", "mandatory"),
+    ("sediment", "sampling", "comm_samp", "xsd:string", "mandatory"),
+    ("water", "sampling", "size_frac_up", "xsd:float", "mandatory"),
+    ("water sediment", "sampling", "replicate", "xsd:integer", "mandatory"),
+    ("water sediment", "sampling", "depth", "xsd:float", "optional"),
+    ("water sediment", "sampling", "tax_id", "xsd:integer", "optional"),
+    ("water sediment", "sampling", "scientific_name", "xsd:string", "optional"),
+    ("water sediment", "sampling", "env_material", "xsd:string", "mandatory"),
+    ("water sediment", "sampling", "samp_store_date", "xsd:date", "optional"),
+    ("water sediment", "sampling", "ship_date", "xsd:date", "optional"),
+    ("water sediment", "sampling", "ship_date_seq", "xsd:date", "optional"),
+    ("water sediment", "sampling", "arr_date_hq", "xsd:date", "optional"),
+    ("water sediment", "sampling", "arr_date_seq", "xsd:date", "optional"),
+    ("water sediment", "sampling", "other_person", "xsd:string", "optional"),
+    ("water sediment", "sampling", "other_person_orcid", "xsd:string", "optional"),
+    ("water sediment", "sampling", "sampl_person", "xsd:string", "optional"),
+    ("water sediment", "sampling", "sampl_person_orcid", "xsd:string", "optional"),
+    ("water sediment", "sampling", "store_person", "xsd:string", "optional"),
+    ("water sediment", "sampling", "store_person_orcid", "xsd:string", "optional"),
+    ("water sediment", "measured", "source_mat_id", "xsd:string", "mandatory"),
+    ("water sediment", "measured", "biomass", "xsd:string", "optional"),
+    ("water sediment", "measured", "chem_administration", "xsd:string", "optional"),
+    ("water", "measured", "ph", "xsd:float", "optional"),
+    ("sediment", "observatory", "so_id", "xsd:string", "mandatory"),
+    ("water", "observatory", "wa_id", "xsd:string", "mandatory"),
+    ("water sediment", "observatory", "tot_depth_water_col", "xsd:float", "mandatory"),
+    ("water sediment", "observatory", "contact_name", "xsd:string", "mandatory"),
+    ("water sediment", "observatory", "contact_orcid", "xsd:string", "mandatory"),
+    ("water sediment", "observatory", "organization_edmoid", "xsd:string", "mandatory"),
+    ("water sediment", "observatory", "env_broad_biome", "xsd:string", "mandatory"),
+    ("water sediment", "observatory", "env_local", "xsd:string", "mandatory"),
+]
+
+
+def scientific_name(tax_id):
+    return f"Species {tax_id}"
+
+
+def given_names(orcid):
+    return f"Given {orcid[-4:]}"
+
+
+def person_name(orcid):
+    return f"{given_names(orcid)} Family"
+
+
+def generate_schema_config():
+    return pd.DataFrame(
+        [(lty, lta, lct, dty, req, "") for lty, lta, lct, dty, req in SCHEMA],
+        columns=["LogsheetType", "LogsheetTab", "LogsheetColumnTitle", "DataTypeOut", "Requirement", "BaseURI"],
+    )
+
+
+def corrupt(rng, values, violation_rate, bad_value):
+    """
+    replace a violation_rate fraction of the values by bad_value
+    """
+    mask = rng.random(len(values)) < violation_rate
+    values = values.copy()
+    values[mask] = bad_value
+    return values
+
+
+def generate_sampling(rng, habitat, rows, violation_rate):
+    days = rng.integers(0, 1000, rows)
+    collection_date = pd.Series(np.datetime64("2021-01-01") + days.astype("timedelta64[D]")).dt.strftime("%Y-%m-%d")
+    shipped = pd.Series(np.datetime64("2021-01-01") + (days + 10).astype("timedelta64[D]")).dt.strftime("%Y-%m-%d")
+    arrived = pd.Series(np.datetime64("2021-01-01") + (days + 20).astype("timedelta64[D]")).dt.strftime("%Y-%m-%d")
+    replicate = pd.Series(rng.integers(1, 4, rows).astype(str))
+    tax_id = rng.choice(TAX_IDS, rows)
+    orcid = {column: rng.choice(ORCIDS, rows) for column in ("other_person", "sampl_person", "store_person")}
+    observatory_id = OBSERVATORY_ID[habitat].replace(" ", "_")
+    df = pd.DataFrame({"collection_date": collection_date, "replicate": replicate})
+    if habitat == "sediment":
+        df["comm_samp"] = rng.choice(["micro", "meio", "macro", "blank"], rows)
+        suffix = df["comm_samp"]
+    else:
+        df["size_frac_up"] = rng.choice(["0.22", "3.0", "20.0"], rows)
+        suffix = df["size_frac_up"].str.replace(r"\.0$", "", regex=True) + "um"
+    df["source_mat_id"] = (
+        f"EMOBON_{observatory_id}_" + collection_date.str[2:].str.replace("-", "") + "_" + suffix + "_" + replicate
+    )
+    df["depth"] = pd.Series(rng.uniform(0, 4, rows)).round(1).astype(str)
+    df["tax_id"] = tax_id
+    df["scientific_name"] = [scientific_name(t) for t in tax_id]
+    df["env_material"] = "marine sediment [ENVO:03000033]" if habitat == "sediment" else "sea water [ENVO:00002149]"
+    df["samp_store_date"] = collection_date
+    df["ship_date"] = shipped
+    df["ship_date_seq"] = shipped
+    df["arr_date_hq"] = arrived
+    df["arr_date_seq"] = arrived
+    for column, values in orcid.items():
+        df[f"{column}_orcid"] = values
+        df[column] = [person_name(o) for o in values]
+
+    # violations
+    df["source_mat_id"] = corrupt(rng, df["source_mat_id"].to_numpy(), violation_rate, "EMOBON_unknown")
+    df["depth"] = corrupt(rng, df["depth"].to_numpy(), violation_rate, "99")
+    df["scientific_name"] = corrupt(rng, df["scientific_name"].to_numpy(), violation_rate, "Species wrong")
+    df["env_material"] = corrupt(rng, df["env_material"].to_numpy(), violation_rate, "no envo term")
+    df["ship_date"] = corrupt(rng, df["ship_date"].to_numpy(), violation_rate, "2000-01-01")
+    df["sampl_person"] = corrupt(rng, df["sampl_person"].to_numpy(), violation_rate, "Wrong Person")
+    if habitat == "sediment":
+        df["comm_samp"] = corrupt(rng, df["comm_samp"].to_numpy(), violation_rate, "nano")
+    return df
+
+
+def generate_measured(rng, habitat, df_sampling, violation_rate):
+    rows = len(df_sampling)
+    df = pd.DataFrame({"source_mat_id": df_sampling["source_mat_id"]})
+    df["biomass"] = corrupt(rng, np.full(rows, "Zostera 1.5E-3", dtype=object), violation_rate, "heavy")
+    df["chem_administration"] = corrupt(rng, np.full(rows, "CHEBI:15377 2021-01-01", dtype=object), violation_rate, "water")
+    if habitat == "water":
+        df["ph"] = pd.Series(rng.uniform(7.5, 8.5, rows)).round(2).astype(str)
+    return df
+
+
+def generate_observatory(habitat):
+    id_column = "so_id" if habitat == "sediment" else "wa_id"
+    return pd.DataFrame(
+        {
+            id_column: [OBSERVATORY_ID[habitat]],
+            "tot_depth_water_col": ["3.5"],
+            "contact_name": [person_name(ORCIDS[0])],
+            "contact_orcid": [ORCIDS[0]],
+            "organization_edmoid": ["1234;5678"],
+            "env_broad_biome": ["marine biome [ENVO:00000447]"],
+            "env_local": ["coast [ENVO:01000687]"],
+        }
+    )
+
+
+def generate_workspace(path, rows, violation_rate=0.05, habitats=("sediment", "water"), seed=0):
+    """
+    write the raw logsheets of a crate with the given number of sampling rows per habitat
+    """
+    rng = np.random.default_rng(seed)
+    raw_path = Path(path) / "logsheets/raw"
+    raw_path.mkdir(parents=True, exist_ok=True)
+    for habitat in habitats:
+        df_sampling = generate_sampling(rng, habitat, rows, violation_rate)
+        df_sampling.to_csv(raw_path / f"{habitat}_sampling.csv", index=False)
+        generate_measured(rng, habitat, df_sampling, violation_rate).to_csv(
+            raw_path / f"{habitat}_measured.csv", index=False
+        )
+        generate_observatory(habitat).to_csv(raw_path / f"{habitat}_observatory.csv", index=False)
+    return Path(path)
@@ -0,0 +1,67 @@
+"""
+import-time regression check, measured with -X importtime, of the entry point and of the stages a run imports once
+its arguments are parsed
+
+    python -m benchmarks.importtime --budget 0.1
+"""
+import argparse
+import subprocess
+import sys
+
+ENTRY_POINT = "action.__main__"
+STAGES = ["action.crate", "action.notify", "action.watch"]  # imported by the entry point to run a crate
+
+# only imported by the code paths that need them, neither by the entry point nor by the stages
+ON_DEMAND = ["github", "requests", "uritemplate", "dotenv", "pyarrow", "cProfile"]
+# only imported by the stages
+EAGER = ["pandas", "numpy", "py_data_rules"]
+LAZY = ON_DEMAND + EAGER
+
+
+def import_times(modules=("sys",)):
+    """
+    module -> cumulative import time in seconds, of a fresh interpreter importing the given modules
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+def check(modules, imported, lazy, budget=None):
+    """
+    print the import time of the modules and the slowest of their imports, besides those already imported,
+    returns whether they import none of the lazy modules and stay within the budget (if any)
+    """
+    times = {name: seconds for name, seconds in import_times(modules).items() if name not in imported}
+    seconds = sum(times.get(module, 0) for module in modules)  # a module imported by another one is counted once
+    eager = [name for name in lazy if name in times]
+    print(f"import {', '.join(modules)}: {seconds:.3f}s")
+    for name, cumulative in sorted(times.items(), key=lambda item: item[1], reverse=True)[:5]:
+        print(f"  {name}: {cumulative:.3f}s")
+    if eager:
+        print(f"  imported eagerly: {', '.join(eager)}")
+    if budget is not None and seconds > budget:
+        print(f"  over the budget of {budget:.3f}s")
+    return not eager and (budget is None or seconds <= budget)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget", type=float, default=0.1, help="maximum cumulative import time of the entry point in seconds")
+    args = parser.parse_args()
+
+    startup = import_times()  # imported by the interpreter itself, e.g. by site
+    ok = check([ENTRY_POINT], startup, LAZY, args.budget)
+    dependencies = import_times(EAGER)  # e.g. pandas imports pyarrow itself when it is installed
+    ok = check(STAGES, startup | dependencies, ON_DEMAND) and ok
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,191 @@
+"""
+the depth, organization_edmoid and envo rules against the row by row implementations they replaced, on synthetic
+tables of increasing size, the violations of both are checked to be the same
+
+    python -m benchmarks.rules --rows 10000 100000
+"""
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+from typing import List
+from .generate import corrupt, generate_observatory, generate_schema_config, generate_workspace
+from .run import bench
+
+
+def reference_rules(aliases_observatory, aliases_sampling):
+    """
+    depth, organization_edmoid and envo rules as they were before they were vectorized, name -> rule
+    """
+    from py_data_rules.data_model import DataModel
+    from py_data_rules.violation import Violation
+
+    def depth(data_model: DataModel) -> List[Violation]:
+        violations = []
+        for alias_observatory, alias_sampling in zip(aliases_observatory, aliases_sampling):
+            dfo = data_model[alias_observatory]
+            dfs = data_model[alias_sampling]
+            tot_depth_water_col = dfo.at[0, "tot_depth_water_col"]
+            for index, row in dfs.iterrows():
+                if not data_model.isna(row["depth"]):
+                    if row["depth"] > tot_depth_water_col:  # TODO absolute value?
+                        violations.append(
+                            Violation(
+                                diagnosis="illegal depth",
+                                table=alias_sampling,
+                                column="depth",
+                                row=index + 1,
+                                value=row["depth"],
+                                extended_diagnosis=f"depth must be less than or equal to tot_depth_water_col ({tot_depth_water_col})",
+                            ),
+                        )
+        return violations
+
+    def organization_edmoid(data_model: DataModel) -> List[Violation]:
+        prefix = "https://edmo.seadatanet.org/report/"
+        violations = []
+        for alias in aliases_observatory:
+            df = data_model[alias]
+            for index, row in df.iterrows():
+                edmo = row["organization_edmoid"]
+                if not data_model.isna(edmo):
+                    try:
+                        repair = ";".join([f"{prefix}{int(i.strip())}" for i in edmo.split(";")])
+                        violations.append(
+                            Violation(
+                                diagnosis="organization edmoid error",
+                                table=alias,
+                                column="organization_edmoid",
+                                row=index + 1,
+                                value=edmo,
+                                extended_diagnosis="organization edmoid should be a list of URIs",
+                                repair=repair,
+                            )
+                        )
+                    except ValueError:
+                        violations.append(
+                            Violation(
+                                diagnosis="organization edmoid error",
+                                table=alias,
+                                column="organization_edmoid",
+                                row=index + 1,
+                                value=edmo,
+                                extended_diagnosis="organization edmoid should be a list of URIs",
+                            )
+                        )
+        return violations
+
+    def envo(column, aliases):
+        def fn(data_model: DataModel) -> List[Violation]:
+            prefix = "http://purl.obolibrary.org/obo/ENVO_"
+            violations = []
+            for alias in aliases:
+                df = data_model[alias]
+                for index, row in df.iterrows():
+                    envo = row[column]
+                    if not data_model.isna(envo):
+                        try:
+                            accession_numbers = [term.strip().split('[ENVO')[-1][1:-1] for term in envo.split(";")]
+                            for an in accession_numbers:
+                                try:
+                                    int(an)
+                                except:
+                                    raise AssertionError
+                            repair = ";".join([f"{prefix}{an}" for an in accession_numbers])
+                            violations.append(
+                                Violation(
+                                    diagnosis="envo term error",
+                                    table=alias,
+                                    column=column,
+                                    row=index + 1,
+                                    value=envo,
+                                    extended_diagnosis="envo term should be a list of URIs",
+                                    repair=repair,
+                                )
+                            )
+                        except (ValueError, IndexError, AssertionError):
+                            violations.append(
+                                Violation(
+                                    diagnosis="envo term error",
+                                    table=alias,
+                                    column=column,
+                                    row=index + 1,
+                                    value=envo,
+                                    extended_diagnosis="envo term should be a list of URIs",
+                                )
+                            )
+            return violations
+        return fn
+
+    return {
+        "depth": depth,
+        "organization_edmoid": organization_edmoid,
+        "env_broad_biome": envo("env_broad_biome", aliases_observatory),
+        "env_local": envo("env_local", aliases_observatory),
+        "env_material": envo("env_material", aliases_sampling),
+    }
+
+
+def generate_tables(path, rows, violation_rate):
+    """
+    raw logsheets of a water crate with the given number of sampling rows, and as many observatory rows,
+    so that the observatory rules are timed on large tables as well
+    """
+    import numpy as np
+    import pandas as pd
+
+    generate_workspace(path, rows, violation_rate, habitats=("water",))
+    rng = np.random.default_rng(1)
+    df = pd.concat([generate_observatory("water")] * rows, ignore_index=True)
+    df["organization_edmoid"] = corrupt(rng, df["organization_edmoid"].to_numpy(), violation_rate, "1234;EDMO")
+    df["env_local"] = corrupt(rng, df["env_local"].to_numpy(), violation_rate, "coast")
+    df["env_broad_biome"] = corrupt(rng, df["env_broad_biome"].to_numpy(), violation_rate, "NA")
+    df.to_csv(Path(path) / "logsheets/raw/water_observatory.csv", index=False)
+    return Path(path) / "logsheets/raw"
+
+
+def run_size(path, rows, violation_rate, repeat):
+    from action.crate import ALIAS2BASENAME_WATER
+    from action.data_model import generate_data_model
+    from action.rules import CommonRuleArray
+    from action.violations import ViolationBatch
+
+    data_model = generate_data_model(
+        logsheets_path=generate_tables(path, rows, violation_rate),
+        alias2basename=ALIAS2BASENAME_WATER,
+        schema_config=generate_schema_config(),
+    )
+    for alias in ALIAS2BASENAME_WATER:  # the rules are timed without the table reads
+        data_model[alias]
+    array = CommonRuleArray("water")
+    results, mismatches = {}, []
+    for name, reference in reference_rules(array.aliases_observatory, array.aliases_sampling).items():
+        old = bench(results, f"{name} (row by row)", lambda: reference(data_model), repeat)
+        new = bench(results, name, lambda: getattr(array, name)(data_model), repeat)
+        old = ViolationBatch.from_violations(old)
+        same = len(old) == len(new) and all(
+            (a == b).all() for a, b in zip(old.cells(), new.cells())
+        )
+        old_seconds, new_seconds = results[f"{name} (row by row)"]["seconds"], results[name]["seconds"]
+        print(
+            f"{rows:>8} {name:<20} {old_seconds:>10.3f}s {new_seconds:>10.3f}s "
+            f"{old_seconds / max(new_seconds, 1e-6):>8.1f}x {len(new):>8} violations{'' if same else '  MISMATCH'}"
+        )
+        if not same:
+            mismatches.append(name)
+    return mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000], help="rows per table, one crate per size")
+    parser.add_argument("--violation-rate", type=float, default=0.05, help="fraction of corrupted cells in the columns with rules")
+    parser.add_argument("--repeat", type=int, default=3, help="the fastest of this many runs is kept")
+    args = parser.parse_args()
+
+    mismatches = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            print(f"{rows} rows", file=sys.stderr)
+            mismatches += run_size(Path(tmp) / f"rows-{rows}", rows, args.violation_rate, args.repeat)
+    sys.exit(1 if mismatches else 0)
@@ -0,0 +1,189 @@
+"""
+time the stages and rules of the data quality control on synthetic crates of increasing size
+
+    python -m benchmarks.run --rows 100 1000 10000 --output bench.json
+    python -m benchmarks.run --rows 100 1000 10000 --output bench.json --compare baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from inspect import getmembers, isfunction
+from pathlib import Path
+from .generate import generate_workspace
+from .stand_in import StandIn
+
+THRESHOLD_DATE = "2030-01-01"  # later than any generated collection_date
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench(results, name, fn, repeat):
+    """
+    run fn repeat times and keep its fastest time, the result of the last run is returned
+    """
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        seconds.append(time.perf_counter() - start)
+    results[name] = {"seconds": round(min(seconds), 6)}
+    if isinstance(result, list):
+        results[name]["violations"] = len(result)
+    print(f"  {name}: {min(seconds):.3f}s", file=sys.stderr)
+    return result
+
+
+def run_size(path, rows, violation_rate, repeat):
+    # imported here, the action reads the stand-in urls from the environment at import time
+    from py_data_rules.rule_engine import RuleEngine
+    from action.crate import ALIAS2BASENAME_SEDIMENT, ALIAS2BASENAME_WATER, Crate, create_reports, filter_logsheets
+    from action.data_model import (
+        HABITATS,
+        SHEETS,
+        fetch_schema_config,
+        generate_data_model,
+        generate_schema,
+        generate_schema_columns,
+        prime_data_types,
+    )
+    from action.dates import DateCache
+    from action.extensions import BatchMatch, read_emobon_csv
+    from action.pipeline import Pipeline
+    from action.rules import CommonRuleArray, SedimentRuleArray, generate_rules
+    from action.violations import ViolationBuffer
+
+    results = {}
+    crate = Crate(generate_workspace(path, rows, violation_rate))
+    crate.mkdirs()
+    alias2basename = {**ALIAS2BASENAME_SEDIMENT, **ALIAS2BASENAME_WATER}
+
+    for habitat in ("sediment", "water"):
+        bench(results, f"filter_logsheets {habitat}", lambda: filter_logsheets(crate, habitat, THRESHOLD_DATE), repeat)
+    for basename in alias2basename.values():
+        bench(results, f"read_emobon_csv {basename}", lambda: read_emobon_csv(crate.logsheets_filtered_path / f"{basename}.csv"), repeat)
+
+    schema_config = bench(results, "fetch_schema_config", fetch_schema_config, repeat)
+    for habitat in HABITATS:
+        for sheet in SHEETS:
+            bench(results, f"generate_schema {habitat}{sheet[0]}", lambda: generate_schema(habitat, sheet, schema_config), repeat)
+    columns = generate_schema_columns(schema_config)
+    for basename in alias2basename.values():
+        df = read_emobon_csv(crate.logsheets_filtered_path / f"{basename}.csv")
+        batch = [
+            (df[label][df[label] != ""], data_type)
+            for label, data_type, _ in columns[(basename[0], basename.split("_")[1])]
+            if isinstance(data_type, BatchMatch) and label in df.columns
+        ]
+        bench(results, f"match_series {basename}", lambda: [data_type.match_series(values) for values, data_type in batch], repeat)
+
+    data_model = generate_data_model(
+        logsheets_path=crate.logsheets_filtered_path,
+        alias2basename=alias2basename,
+        columns=columns,
+    )
+    for alias in alias2basename:  # the rules are timed without the table reads
+        data_model[alias]
+    for array in (CommonRuleArray, SedimentRuleArray):
+        for name, _ in getmembers(array("all") if array is CommonRuleArray else array(), isfunction):
+            # a fresh rule array per run, so that the lookups are not served from memory
+            batch = bench(
+                results,
+                f"{array.__name__}.{name}",
+                lambda: getattr(array("all") if array is CommonRuleArray else array(), name)(data_model),
+                repeat,
+            )
+            results[f"{array.__name__}.{name}"]["violations"] = len(batch)
+
+    violations = ViolationBuffer()
+    rules = generate_rules("all", violations=violations)
+    bench(
+        results,
+        "RuleEngine.execute",
+        lambda: (
+            violations.clear(),
+            prime_data_types(data_model, alias2basename, columns, DateCache()),
+            RuleEngine(data_model=data_model, rules=rules).execute(report_path=crate.dqc_path / "dqc.csv"),
+        ),
+        repeat,
+    )
+    results["RuleEngine.execute"]["violations"] = len(violations)
+    sink = bench(
+        results,
+        "create_report",
+        lambda: create_reports(violations, crate.dqc_path / "dqc.csv", crate.dqc_path / "report.csv"),
+        repeat,
+    )
+    results["create_report"]["report_rows"] = sink.report_rows
+    bench(
+        results,
+        "Pipeline.run",
+        lambda: Pipeline(
+            input_path=crate.logsheets_filtered_path,
+            output_path=crate.logsheets_transformed_path,
+            violations=violations,
+            alias2basename=alias2basename,
+        ).run(),
+        repeat,
+    )
+    return results
+
+
+def compare(current, baseline, tolerance):
+    """
+    print the timings that got slower than the baseline by more than the tolerance, returns their number
+    """
+    regressions = 0
+    for rows, results in current["results"].items():
+        for name, result in results.items():
+            old = baseline["results"].get(rows, {}).get(name)
+            if old is None or old["seconds"] <= 0:
+                continue
+            ratio = result["seconds"] / old["seconds"]
+            flag = ""
+            if ratio > 1 + tolerance and result["seconds"] - old["seconds"] > 0.01:  # ignore noise on tiny timings
+                flag = "  REGRESSION"
+                regressions += 1
+            print(f"{rows:>8} {name:<60} {old['seconds']:>10.3f}s {result['seconds']:>10.3f}s {ratio:>6.2f}x{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 10000], help="sampling rows per habitat, one crate per size")
+    parser.add_argument("--violation-rate", type=float, default=0.05, help="fraction of corrupted cells in the columns with rules")
+    parser.add_argument("--repeat", type=int, default=3, help="the fastest of this many runs is kept")
+    parser.add_argument("--output", type=Path, default=Path("bench.json"))
+    parser.add_argument("--compare", type=Path, help="results of a previous run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="relative slowdown reported as a regression")
+    args = parser.parse_args()
+
+    with StandIn() as stand_in, tempfile.TemporaryDirectory() as tmp:
+        os.environ.update(stand_in.environment)
+        benchmark = {
+            "commit": git_commit(),
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "violation_rate": args.violation_rate,
+            "repeat": args.repeat,
+            "results": {},
+        }
+        for rows in args.rows:
+            print(f"{rows} rows", file=sys.stderr)
+            benchmark["results"][str(rows)] = run_size(Path(tmp) / f"rows-{rows}", rows, args.violation_rate, args.repeat)
+
+    args.output.write_text(json.dumps(benchmark, indent=2))
+    if args.compare:
+        sys.exit(1 if compare(benchmark, json.loads(args.compare.read_text()), args.tolerance) else 0)
@@ -0,0 +1,94 @@
+"""
+local http stand-in for the logsheet schema, the ncbi e-utilities and the orcid api
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from .generate import generate_schema_config, given_names, scientific_name
+
+UNKNOWN_TAX_IDS = {"0"}  # answered like ncbi answers a tax_id it does not know
+
+
+class Handler(BaseHTTPRequestHandler):
+    schema = generate_schema_config().to_csv(index=False).encode()
+
+    def log_message(self, format, *args):  # keep the benchmark output quiet
+        pass
+
+    def reply(self, body, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        url = urlparse(self.path)
+        if url.path != "/schema.csv":
+            time.sleep(self.server.delay)
+        if url.path == "/schema.csv":
+            self.reply(self.schema, "text/csv")
+        elif url.path == "/esummary":
+            tax_ids = parse_qs(url.query).get("id", [""])[0].split(",")
+            result = {
+                tax_id: {"uid": tax_id, "error": "cannot get document summary"}
+                if tax_id in UNKNOWN_TAX_IDS
+                else {"uid": tax_id, "scientificname": scientific_name(tax_id)}
+                for tax_id in tax_ids
+            }
+            self.reply(json.dumps({"result": {"uids": tax_ids, **result}}).encode(), "application/json")
+        elif url.path.startswith("/orcid/"):
+            orcid = url.path.rsplit("/", 1)[-1]
+            name = {"given-names": {"value": given_names(orcid)}, "family-name": {"value": "Family"}}
+            self.reply(json.dumps({"person": {"name": name}}).encode(), "application/json")
+        else:
+            self.send_error(404)
+
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # the lookups open many connections at once
+
+
+class StandIn:
+    """
+    serve the stand-in on a free local port for as long as the context is entered, the paths requested are kept,
+    delay: seconds the lookups take to answer, e.g. to trip the time budgets
+    """
+    def __init__(self, delay=0):
+        self.delay = delay
+
+    def __enter__(self):
+        self.server = Server(("127.0.0.1", 0), Handler)
+        self.server.requests = []
+        self.server.delay = self.delay
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    @property
+    def requests(self):
+        return self.server.requests
+
+    @property
+    def environment(self):
+        """
+        environment variables pointing the action at the stand-in, these are read when the action is imported
+        """
+        return {
+            "LOGSHEET_SCHEMA_URL": f"{self.url}/schema.csv",
+            "NCBI_ESUMMARY_URL": f"{self.url}/esummary",
+            "ORCID_API_URL": f"{self.url}/orcid/{{orcid}}",
+        }
@@ -0,0 +1,62 @@
+"""
+time budgets of the remote lookups, against a stand-in that answers slower than the budgets allow
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from action.budget import current_deadline
+from action.lookups import OrcidResolver
+from benchmarks.generate import ORCIDS, generate_workspace
+from benchmarks.stand_in import StandIn
+
+REPOSITORY = Path(__file__).resolve().parents[1]
+DELAY = 30  # seconds the stand-in takes to answer a lookup
+
+RUN = """
+import json, sys
+from action.crate import run_crate
+from benchmarks.generate import generate_schema_config
+result = run_crate(
+    sys.argv[1], sediment=True, water=True, threshold_date="2030-01-01", schema_config=generate_schema_config(),
+    time_budget=float(sys.argv[2]),
+)
+print(json.dumps(result))
+"""
+
+
+def test_lookups_stop_at_the_deadline(monkeypatch):
+    with StandIn(delay=DELAY) as stand_in:
+        monkeypatch.setattr("action.lookups.ORCID_API_URL", f"{stand_in.url}/orcid/{{orcid}}")
+        resolver = OrcidResolver(max_workers=2)
+        token = current_deadline.set(time.monotonic() + 1)
+        try:
+            start = time.perf_counter()
+            assert resolver.resolve(ORCIDS[:5]) == {}
+            assert time.perf_counter() - start < 2
+        finally:
+            current_deadline.reset(token)
+        assert resolver.skipped == set(ORCIDS[:5])  # retried by later callers
+        time.sleep(2)  # the abandoned lookups time out at the deadline
+        assert len(stand_in.requests) == 2  # one lookup per thread, neither retried past the deadline
+
+
+def test_run_finishes_within_the_time_budget(tmp_path):
+    workspace = generate_workspace(tmp_path / "crate", rows=20)
+    budget = 3
+    with StandIn(delay=DELAY) as stand_in:
+        start = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, "-c", RUN, str(workspace), str(budget)],
+            cwd=REPOSITORY,
+            env={**os.environ, **stand_in.environment},
+            capture_output=True,
+            text=True,
+            timeout=DELAY,
+        )
+        seconds = time.perf_counter() - start  # until the interpreter exited, abandoned lookups included
+    assert process.returncode == 0, process.stderr
+    assert "tax_id_versus_scientific_name" in json.loads(process.stdout.splitlines()[-1])["incomplete"]
+    assert seconds < budget + 5  # the time budget, plus the imports and the local rules
@@ -0,0 +1,54 @@
+"""
+csv outputs of a run with the columnar outputs and the raw cache against those of a plain run
+"""
+import shutil
+import pytest
+import action.crate
+import action.lookups
+from action.crate import run_crate
+from benchmarks.generate import generate_schema_config, generate_workspace
+from benchmarks.stand_in import StandIn
+
+pytest.importorskip("pyarrow")
+
+
+@pytest.fixture
+def stand_in(monkeypatch):
+    with StandIn() as stand_in:
+        monkeypatch.setattr(action.lookups, "NCBI_ESUMMARY_URL", f"{stand_in.url}/esummary")
+        monkeypatch.setattr(action.lookups, "ORCID_API_URL", f"{stand_in.url}/orcid/{{orcid}}")
+        yield stand_in
+
+
+def run(workspace, **options):
+    """
+    path -> bytes of the csv outputs of a run
+    """
+    run_crate(workspace, sediment=True, water=True, threshold_date="2030-01-01", schema_config=generate_schema_config(), **options)
+    return {
+        path.relative_to(workspace): path.read_bytes()
+        for path in sorted(workspace.rglob("*.csv"))
+        if "raw" not in path.parts and "cache" not in path.parts
+    }
+
+
+def test_csv_outputs_are_unchanged(tmp_path, stand_in, monkeypatch):
+    workspace = generate_workspace(tmp_path / "generated", rows=300)
+    path = workspace / "logsheets/raw/water_sampling.csv"
+    # leading zeros, padded na literals and empty cells, which a typed round trip would not keep
+    path.write_text(path.read_text().replace(",3.0,", ",003.0,", 5).replace(",1,", ", NA ,", 5).replace(",2,", ",,", 5))
+    copies = {}
+    for name in ("plain", "columnar"):
+        copies[name] = tmp_path / name
+        shutil.copytree(workspace / "logsheets/raw", copies[name] / "logsheets/raw")
+    expected = run(copies["plain"])
+    assert len(expected) > 2  # dqc.csv, report.csv and the filtered and transformed logsheets
+
+    parsed = []
+    read_raw_csv = action.crate.read_raw_csv
+    monkeypatch.setattr(action.crate, "read_raw_csv", lambda path: parsed.append(path) or read_raw_csv(path))
+    assert run(copies["columnar"], columnar=True, raw_cache=True) == expected
+    assert parsed
+    parsed.clear()
+    assert run(copies["columnar"], columnar=True, raw_cache=True) == expected
+    assert not parsed  # served from the raw cache
@@ -0,0 +1,73 @@
+"""
+read_emobon_csv and the batch matching of the data types against the cell by cell implementations they replaced
+"""
+import pandas as pd
+import pytest
+from action.data_model import generate_schema_columns, prime_data_types
+from action.dates import DateCache
+from action.extensions import read_emobon_csv
+
+
+def read_emobon_csv_reference(path):
+    df = (
+        pd.read_csv(path, dtype=object, keep_default_na=False)
+        .astype(str)
+        .map(lambda _: _.strip())
+        .map(lambda _: "" if _ == "nan" else _)
+        .map(lambda _: "" if (_ == "NA") or (_ =="ΝΑ") else _)  # prevent unicode confusion by replacing both greek and latin NA)
+    )
+    df = df[~(df == "").all(axis=1)]  # drop empty rows
+    return df
+
+
+SHEETS = {
+    "na literals": "a,b,c\nNA,ΝΑ,nan\nNA,1,x\nΝΑ,nan,y\n",
+    "na lookalikes": "a,b,c\nNaN,na,N/A\nnull,None,NA NA\n-,n/a,ΝA\n",
+    "surrounding whitespace": "a,b,c\n  x ,\ty\t, NA \n\" nan \",\"  ΝΑ\",\" 1.0 \"\n",
+    "empty rows": "a,b,c\n,,\nx,,\n  ,NA,nan\n,,\n\"\",\" \",\ny,z,\n",
+    "short rows": "a,b,c\nx\n,y\n,,\n",
+    "header only": "a,b,c\n",
+    "header only with empty rows": "a,b,c\n,,\nNA,nan,ΝΑ\n",
+    "numbers and dates": "a,b,c\n007,1e3,2024-01-01\n -0.50 ,+1,2024-01-01T10:00\n",
+}
+
+
+@pytest.mark.parametrize("sheet", SHEETS)
+def test_read_emobon_csv(tmp_path, sheet):
+    path = tmp_path / "sheet.csv"
+    path.write_text(SHEETS[sheet], encoding="utf-8")
+    pd.testing.assert_frame_equal(read_emobon_csv(path), read_emobon_csv_reference(path))
+
+
+DATA_TYPES = ["xsd:float", "xsd:double", "xsd:integer", "xsd:date", "xsd:datetime", "range", "xsd:list"]
+VALUES = [
+    "5", "+5", "-5", "05", "1.", ".5", "-.5e-3", "1e5", "1E+05", "1e", " 1", "1 ", "nan", "NaN", "inf", "-Infinity",
+    "1_000", "١٢", "1,5", "1;2", "1-2", "2-1", "1 - 2", "-1-2", "1-2-3", "1-", "a",
+    "2021-03-01", "2021-3-1", "2021-02-30", "2921-01-01", "1500-01-01", "20210301", "2021-03-01 ",
+    "2021-03-01T10:00", "2021-03-01T10:00+0100", "2021-03-01T25:00", "2021-03-01 10:00",
+]
+
+
+def schema_data_types():
+    """
+    the data types of a schema with a column of each type, as generate_schema_columns builds them
+    """
+    config = pd.DataFrame(
+        [("water", "sampling", dty, dty, "optional", "") for dty in DATA_TYPES],
+        columns=["LogsheetType", "LogsheetTab", "LogsheetColumnTitle", "DataTypeOut", "Requirement", "BaseURI"],
+    )
+    return generate_schema_columns(config)
+
+
+@pytest.mark.parametrize("dty", DATA_TYPES)
+def test_batch_matching(dty):
+    columns = schema_data_types()
+    (column,) = [column for column in columns[("w", "sampling")] if column[0] == dty]
+    data_type = column[1]
+    # match_one is the match of the library for the xsd types, the cell by cell match of the emobon types
+    expected = [data_type.match_one(value) for value in VALUES]
+    assert data_type.match_series(pd.Series(VALUES)).tolist() == expected
+    # primed as the engine stage primes them, dates through the cache, then served cell by cell
+    prime_data_types({"ws": pd.DataFrame({dty: VALUES})}, {"ws": "water_sampling"}, columns, DateCache())
+    assert data_type.matches == dict(zip(VALUES, expected))
+    assert [data_type.match(value) for value in VALUES] == expected
@@ -0,0 +1,97 @@
+"""
+incremental runs against a fresh full run of the same logsheets, on a synthetic crate served by the local stand-in
+"""
+import shutil
+import pandas as pd
+import pytest
+import action.lookups
+from action.crate import run_crate
+from benchmarks.generate import generate_schema_config, generate_workspace
+from benchmarks.stand_in import StandIn
+
+THRESHOLD_DATE = "2023-06-01"
+
+
+@pytest.fixture
+def stand_in(monkeypatch):
+    with StandIn() as stand_in:
+        monkeypatch.setattr(action.lookups, "NCBI_ESUMMARY_URL", f"{stand_in.url}/esummary")
+        monkeypatch.setattr(action.lookups, "ORCID_API_URL", f"{stand_in.url}/orcid/{{orcid}}")
+        yield stand_in
+
+
+@pytest.fixture
+def workspace(tmp_path, stand_in):
+    return generate_workspace(tmp_path / "incremental", rows=200)
+
+
+def run(workspace, **options):
+    run_crate(workspace, sediment=True, water=True, threshold_date=THRESHOLD_DATE, schema_config=generate_schema_config(), **options)
+    return (workspace / "data-quality-control/dqc.csv").read_text()
+
+
+def full_run(workspace):
+    """
+    dqc.csv of a fresh run without manifest, on a copy of the raw logsheets
+    """
+    fresh = workspace.parent / "full"
+    shutil.rmtree(fresh, ignore_errors=True)
+    shutil.copytree(workspace / "logsheets/raw", fresh / "logsheets/raw")
+    return run(fresh)
+
+
+def edit(workspace, sheet, change):
+    path = workspace / "logsheets/raw" / sheet
+    df = change(pd.read_csv(path, dtype=object, keep_default_na=False))
+    df.to_csv(path, index=False)
+
+
+def append_rows(df):
+    return pd.concat([df, df.iloc[:5].assign(depth="42")], ignore_index=True)
+
+
+def edit_rows(df):
+    df.loc[10:19, "scientific_name"] = "Species edited"
+    df.loc[20:24, "ship_date"] = "1999-01-01"
+    return df
+
+
+def delete_rows(df):
+    return df.drop(index=range(30, 60)).reset_index(drop=True)
+
+
+def change_observatory(df):
+    df["tot_depth_water_col"] = "1.5"
+    df["organization_edmoid"] = "1234;x"
+    return df
+
+
+def test_incremental_runs_match_full_runs(workspace):
+    assert run(workspace, incremental=True) == full_run(workspace)
+    for sheet, change in [
+        ("water_sampling.csv", append_rows),
+        ("water_sampling.csv", edit_rows),
+        ("sediment_sampling.csv", delete_rows),
+        ("sediment_observatory.csv", change_observatory),
+    ]:
+        edit(workspace, sheet, change)
+        assert run(workspace, incremental=True) == full_run(workspace), f"{change.__name__} of {sheet}"
+
+
+def test_full_rebuild(workspace):
+    run(workspace, incremental=True)
+    edit(workspace, "water_sampling.csv", edit_rows)
+    assert run(workspace, incremental=True, full_rebuild=True) == full_run(workspace)
+    edit(workspace, "water_sampling.csv", delete_rows)
+    assert run(workspace, incremental=True) == full_run(workspace)
+
+
+def test_rows_with_failed_lookups_are_controlled_again(workspace, stand_in, monkeypatch):
+    monkeypatch.setattr(action.lookups, "ORCID_API_URL", f"{stand_in.url}/missing/{{orcid}}")
+    monkeypatch.setattr(action.lookups, "NCBI_ESUMMARY_URL", f"{stand_in.url}/missing")
+    run(workspace, incremental=True)
+    monkeypatch.setattr(action.lookups, "ORCID_API_URL", f"{stand_in.url}/orcid/{{orcid}}")
+    monkeypatch.setattr(action.lookups, "NCBI_ESUMMARY_URL", f"{stand_in.url}/esummary")
+    dqc = run(workspace, incremental=True)
+    assert "Species wrong" in dqc and "Wrong Person" in dqc
+    assert dqc == full_run(workspace)
@@ -0,0 +1,90 @@
+"""
+ncbi taxonomy lookups and their cache, against the local stand-in of the e-utilities
+"""
+import json
+import pytest
+from urllib.parse import parse_qs, urlparse
+import action.lookups
+from action.cache import LookupCache
+from action.lookups import TaxonomyResolver
+from benchmarks.generate import scientific_name
+from benchmarks.stand_in import StandIn
+
+TAX_IDS = ["9606", "10090", "7227", "6239", "3702", "4932", "562"]
+
+
+@pytest.fixture
+def stand_in(monkeypatch):
+    with StandIn() as stand_in:
+        monkeypatch.setattr(action.lookups, "NCBI_ESUMMARY_URL", f"{stand_in.url}/esummary")
+        yield stand_in
+
+
+def esummary_batches(stand_in):
+    """
+    tax_ids of each esummary request, in the order of the requests
+    """
+    return [
+        parse_qs(urlparse(path).query)["id"][0].split(",")
+        for path in stand_in.requests
+        if urlparse(path).path == "/esummary"
+    ]
+
+
+def backdate(path, seconds):
+    entries = json.loads(path.read_text())
+    path.write_text(json.dumps({key: [value, timestamp - seconds] for key, (value, timestamp) in entries.items()}))
+
+
+def test_resolve_in_batches(stand_in, tmp_path):
+    resolver = TaxonomyResolver(LookupCache(tmp_path / "ncbi.json"), batch_size=3)
+    resolved = resolver.resolve(TAX_IDS + TAX_IDS[:2])
+    assert resolved == {tax_id: scientific_name(tax_id) for tax_id in TAX_IDS}
+    assert esummary_batches(stand_in) == [TAX_IDS[0:3], TAX_IDS[3:6], TAX_IDS[6:7]]
+    assert resolver.resolve(TAX_IDS) == resolved
+    assert len(esummary_batches(stand_in)) == 3  # served from memory
+
+
+def test_warm_run_makes_no_requests(stand_in, tmp_path):
+    resolved = TaxonomyResolver(LookupCache(tmp_path / "ncbi.json")).resolve(TAX_IDS + ["0"])
+    assert "0" not in resolved
+    requests = len(stand_in.requests)
+    assert TaxonomyResolver(LookupCache(tmp_path / "ncbi.json")).resolve(TAX_IDS + ["0"]) == resolved
+    assert len(stand_in.requests) == requests
+
+
+def test_unresolved_tax_ids_are_cached(stand_in, tmp_path):
+    TaxonomyResolver(LookupCache(tmp_path / "ncbi.json")).resolve(["0", "9606"])
+    assert LookupCache(tmp_path / "ncbi.json").get("0") == action.lookups.UNRESOLVED
+    assert TaxonomyResolver(LookupCache(tmp_path / "ncbi.json")).resolve(["0"]) == {}
+    assert esummary_batches(stand_in) == [["0", "9606"]]
+
+
+def test_failed_requests_are_not_cached(stand_in, tmp_path, monkeypatch):
+    monkeypatch.setattr(action.lookups, "NCBI_ESUMMARY_URL", f"{stand_in.url}/missing")
+    assert TaxonomyResolver(LookupCache(tmp_path / "ncbi.json")).resolve(["9606"]) == {}
+    assert LookupCache(tmp_path / "ncbi.json").get("9606") is None
+
+
+def test_expired_entries_are_requested_again(stand_in, tmp_path):
+    path = tmp_path / "ncbi.json"
+    TaxonomyResolver(LookupCache(path, ttl=60)).resolve(["9606", "0"])
+    backdate(path, 30)
+    TaxonomyResolver(LookupCache(path, ttl=60)).resolve(["9606", "0"])
+    assert len(esummary_batches(stand_in)) == 1
+    backdate(path, 31)
+    assert TaxonomyResolver(LookupCache(path, ttl=60)).resolve(["9606", "0"]) == {"9606": scientific_name("9606")}
+    assert esummary_batches(stand_in) == [["9606", "0"], ["9606", "0"]]
+
+
+def test_oldest_entries_are_evicted(stand_in, tmp_path):
+    path = tmp_path / "ncbi.json"
+    for tax_id in reversed(TAX_IDS):  # the first tax_id is the newest
+        TaxonomyResolver(LookupCache(path)).resolve([tax_id])
+        backdate(path, 1)
+    cache = LookupCache(path, max_entries=3)
+    cache.save()
+    assert sorted(LookupCache(path).entries) == sorted(TAX_IDS[:3])
+    requests = len(esummary_batches(stand_in))
+    TaxonomyResolver(LookupCache(path, max_entries=3)).resolve(TAX_IDS[:4])
+    assert esummary_batches(stand_in)[requests:] == [TAX_IDS[3:4]]
@@ -0,0 +1,22 @@
+"""
+checks of the command line arguments, before anything is run
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+REPOSITORY = Path(__file__).resolve().parents[1]
+
+
+def test_batch_patterns_matching_no_workspace_are_errors(tmp_path):
+    (tmp_path / "observatory-a-crate").mkdir()
+    process = subprocess.run(
+        [sys.executable, "-m", "action", "--batch", "observatory-*-crate", "observatory-b-crate", "typo-*"],
+        cwd=tmp_path,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(REPOSITORY), os.getenv("PYTHONPATH")]))},
+        capture_output=True,
+        text=True,
+    )
+    assert process.returncode == 2
+    assert "no workspace matches observatory-b-crate, typo-*" in process.stderr
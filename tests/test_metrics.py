@@ -0,0 +1,36 @@
+"""
+metrics.json and the profile of a run
+"""
+import json
+import pstats
+import pytest
+import action.lookups
+from action.crate import run_crate
+from benchmarks.generate import generate_schema_config, generate_workspace
+from benchmarks.stand_in import StandIn
+
+
+@pytest.fixture
+def stand_in(monkeypatch):
+    with StandIn() as stand_in:
+        monkeypatch.setattr(action.lookups, "NCBI_ESUMMARY_URL", f"{stand_in.url}/esummary")
+        monkeypatch.setattr(action.lookups, "ORCID_API_URL", f"{stand_in.url}/orcid/{{orcid}}")
+        yield stand_in
+
+
+def test_profile_covers_the_rules(tmp_path, stand_in):
+    workspace = generate_workspace(tmp_path / "crate", rows=50)
+    run_crate(
+        workspace, sediment=True, water=True, threshold_date="2030-01-01", schema_config=generate_schema_config(),
+        rule_workers=4, profile=True,
+    )
+    dqc_path = workspace / "data-quality-control"
+    profiled = {(file, name) for file, _, name in pstats.Stats(str(dqc_path / "profile.pstats")).stats}
+    assert ("action/rules.py", "depth") in {(file[-len("action/rules.py"):], name) for file, name in profiled}
+
+    metrics = json.loads((dqc_path / "metrics.json").read_text())
+    stages = {record["name"]: record for record in metrics["stages"]}
+    report = stages["create_report"]
+    assert report["violations"] is None and report["report_rows"] > 0
+    assert stages["RuleEngine.execute"]["violations"] == len((dqc_path / "dqc.csv").read_text().splitlines()) - 1
+    assert all(record["max_rss_mb"] > 0 for record in metrics["stages"])
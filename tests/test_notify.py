@@ -0,0 +1,69 @@
+"""
+notifications of the end user, against a local fake of the github api
+"""
+import pytest
+import action.notify
+from action.notify import ReportChanges, ReportDigest, create_issue, github_client
+from benchmarks.fake_github import FakeGitHub
+
+REPOSITORY = "emo-bon/observatory-fake-crate"
+ASSIGNEE = "end-user"
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    with FakeGitHub() as fake:
+        monkeypatch.setattr(action.notify, "GITHUB_API_URL", fake.url)
+        github_client.cache_clear()
+        yield fake
+    github_client.cache_clear()
+
+
+def write_report(path, rows):
+    """
+    a report.csv with a violation per (diagnosis, row)
+    """
+    lines = ["Diagnosis,LogsheetType,LogsheetTab,Column,Row,Value,ExtendedDiagnosis,FilePath,DataType,Requirement"]
+    lines += [f"{diagnosis},water,sampling,depth,{row},x,\\,,,mandatory" for diagnosis, row in rows]
+    path.write_text("\n".join(lines) + "\n")
+
+
+def notify(report_path, previous):
+    """
+    notify like run_crate does, returns whether the end user was notified
+    """
+    changes = ReportChanges(previous, ReportDigest.read(report_path))
+    if changes.unchanged:
+        return False
+    create_issue("token", REPOSITORY, "2024-01-01", ASSIGNEE, changes)
+    return True
+
+
+def test_the_end_user_is_notified_of_changes(tmp_path, fake):
+    report_path = tmp_path / "report.csv"
+    first = [("invalid date", row) for row in range(1, 6)] + [("unknown tax_id", 7)]
+    second = [("invalid date", row) for row in range(1, 4)] + [("unknown tax_id", 7), ("not in list", 9)]
+    notified = []
+    for rows in (first, first, second):
+        previous = ReportDigest.read(report_path)
+        write_report(report_path, rows)
+        notified.append(notify(report_path, previous))
+    assert notified == [True, False, True]  # not notified of the same report
+    assert len(fake.server.issues[REPOSITORY]) == 1
+    assert len(fake.server.comments) == 1
+    assert "1 new and 2 resolved" in fake.server.comments[0]["body"]
+
+
+def test_only_issues_of_the_action_are_commented(tmp_path, fake):
+    fake.server.add_issue(REPOSITORY, "Data Quality Control 2024-01-01", assignee=ASSIGNEE, pull_request=True)
+    fake.server.add_issue(REPOSITORY, "Data Quality Control questions", assignee=ASSIGNEE)
+    fake.server.add_issue(REPOSITORY, "Data Quality Control 2024-01-01", assignee="someone-else")
+    write_report(tmp_path / "report.csv", [("invalid date", 1)])
+    notify(tmp_path / "report.csv", None)
+    assert fake.server.comments == []
+    created = fake.server.issues[REPOSITORY][-1]
+    assert created["number"] == 4 and created["assignee"] == {"login": ASSIGNEE}
+
+    fake.server.add_issue(REPOSITORY, "Data Quality Control questions 2024-01-01", assignee=ASSIGNEE)
+    notify(tmp_path / "report.csv", None)
+    assert [comment["issue_url"] for comment in fake.server.comments] == [created["url"]]  # the newest of the action
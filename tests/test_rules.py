@@ -0,0 +1,45 @@
+"""
+rules that hand the library only some of the rows, against the library rule on all rows
+"""
+import pandas as pd
+import py_data_rules.rule_factory as rf
+from action.data_model import generate_data_model
+from action.dates import DateCache
+from action.rules import x_after_y
+from action.violations import ViolationBatch
+from benchmarks.generate import generate_schema_config
+
+DATES = [  # samp_store_date, ship_date
+    ("2021-03-01", "2021-03-02"),  # in order
+    ("2021-03-01", "2021-03-01"),  # equal
+    ("2021-03-02", "2021-03-01"),  # reversed
+    ("2920-01-01", "2921-01-01"),  # in order, beyond the range of datetime64[ns]
+    ("2921-01-01", "2921-01-01"),  # equal, beyond the range
+    ("2921-01-02", "2921-01-01"),  # reversed, beyond the range
+    ("1500-01-01", "2021-03-01"),  # in order, before the range
+    ("2021-03-01", "1500-01-01"),  # reversed, before the range
+    ("2021-1-5", "2021-01-06"),  # not canonical
+    ("2021-01-05", "2021-13-01"),  # unparsable
+    ("2021-01-05", ""),  # missing
+    ("", "2021-01-05"),  # missing
+    ("NA", "2021-01-05"),  # na literal
+]
+
+
+def data_model(tmp_path):
+    df = pd.DataFrame(DATES, columns=["samp_store_date", "ship_date"])
+    df.to_csv(tmp_path / "water_sampling.csv", index=False)
+    return generate_data_model(
+        logsheets_path=tmp_path,
+        alias2basename={"ws": "water_sampling"},
+        schema_config=generate_schema_config(),
+    )
+
+
+def test_x_after_y_matches_the_library(tmp_path):
+    dm = data_model(tmp_path)
+    expected = ViolationBatch.from_violations(rf.x_after_y("ship_date", "samp_store_date", ["ws"])(dm))
+    dates = DateCache()
+    rule = x_after_y("ship_date", "samp_store_date", ["ws"], dates)
+    assert ViolationBatch.from_violations(rule(dm)).to_json() == expected.to_json()
+    assert ViolationBatch.from_violations(rule(dm)).to_json() == expected.to_json()  # served from the cache
@@ -0,0 +1,32 @@
+"""
+rules run concurrently against the same crate controlled with the rules run serially
+"""
+import shutil
+import pytest
+import action.lookups
+from action.crate import run_crate
+from benchmarks.generate import generate_schema_config, generate_workspace
+from benchmarks.stand_in import StandIn
+
+
+@pytest.fixture
+def stand_in(monkeypatch):
+    with StandIn() as stand_in:
+        monkeypatch.setattr(action.lookups, "NCBI_ESUMMARY_URL", f"{stand_in.url}/esummary")
+        monkeypatch.setattr(action.lookups, "ORCID_API_URL", f"{stand_in.url}/orcid/{{orcid}}")
+        yield stand_in
+
+
+def test_outputs_do_not_depend_on_the_rule_workers(tmp_path, stand_in):
+    workspace = generate_workspace(tmp_path / "generated", rows=500)
+    outputs = {}
+    for rule_workers in (1, 4):
+        copy = tmp_path / f"rule-workers-{rule_workers}"
+        shutil.copytree(workspace / "logsheets/raw", copy / "logsheets/raw")
+        run_crate(
+            copy, sediment=True, water=True, threshold_date="2030-01-01", schema_config=generate_schema_config(),
+            rule_workers=rule_workers,
+        )
+        outputs[rule_workers] = [(copy / "data-quality-control" / name).read_bytes() for name in ("dqc.csv", "report.csv")]
+    assert outputs[1][0].count(b"\n") > 1  # violations were found
+    assert outputs[4] == outputs[1]
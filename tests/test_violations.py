@@ -0,0 +1,111 @@
+"""
+dqc.csv as the engine writes it with the rules, and report.csv written from it and from the buffers of earlier runs
+"""
+import csv
+import pytest
+import action.lookups
+from py_data_rules.rule_engine import RuleEngine
+from action.crate import ALIAS2BASENAME_SEDIMENT, ALIAS2BASENAME_WATER, Crate, create_reports, run_crate
+from action.data_model import generate_data_model
+from action.report import DQC_COLUMNS
+from action.rules import generate_rules, record_violations
+from action.violations import ViolationBatch, ViolationBuffer
+from benchmarks.generate import generate_schema_config, generate_workspace
+from benchmarks.stand_in import StandIn
+
+DQC_ROWS = [  # a schema violation, two rule violations and a repaired one, as the engine writes them
+    ["ws", "depth", "3", "deep", "invalid data type", "", "", "water_sampling.csv", "xsd:float", "True"],
+    ["ws", "depth", "2", "12", "illegal depth", "depth must be less than or equal to tot_depth_water_col (10)", "", "water_sampling.csv", "xsd:float", "True"],
+    ["ss", "tax_id", "7", "", "missing value", "", "", "sediment_sampling.csv", "xsd:integer", "False"],
+    ["so", "env_local", "1", "coast [ENVO:00000303]", "envo term error", "envo term should be a list of URIs", "http://purl.obolibrary.org/obo/ENVO_00000303", "sediment_observatory.csv", "xsd:string", "False"],
+]
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f, lineterminator="\n").writerows(rows)
+
+
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.reader(f))
+
+
+def test_report_of_the_engine_dqc_csv(tmp_path):
+    write_csv(tmp_path / "dqc.csv", [DQC_COLUMNS, *DQC_ROWS])
+    written = (tmp_path / "dqc.csv").read_bytes()
+    sink = create_reports(ViolationBuffer(), tmp_path / "dqc.csv", tmp_path / "report.csv")
+    assert (tmp_path / "dqc.csv").read_bytes() == written
+    report = read_csv(tmp_path / "report.csv")
+    assert [row[0] for row in report[1:]] == ["invalid data type", "illegal depth", "missing value"]
+    assert report[2] == [
+        "illegal depth", "water", "sampling", "depth", "2", "12",
+        "depth must be less than or equal to tot_depth_water_col (10)", "water_sampling.csv", "xsd:float", "optional",
+    ]
+    assert report[3] == ["missing value", "sediment", "sampling", "tax_id", "7", "<empty>", "\\", "sediment_sampling.csv", "xsd:integer", "mandatory"]
+    assert (sink.rows, sink.report_rows) == (4, 3)
+
+
+def test_other_buffers_are_appended(tmp_path):
+    write_csv(tmp_path / "dqc.csv", [DQC_COLUMNS, *DQC_ROWS[2:]])
+    other = ViolationBuffer()
+    other.read_dqc(tmp_path / "dqc.csv")
+    write_csv(tmp_path / "dqc.csv", [DQC_COLUMNS, *DQC_ROWS[:2]])
+    create_reports(ViolationBuffer(), tmp_path / "dqc.csv", tmp_path / "report.csv", others=[other])
+    assert read_csv(tmp_path / "dqc.csv") == [DQC_COLUMNS, *DQC_ROWS]
+
+
+def test_dqc_csv_is_rewritten_when_the_engine_wrote_other_columns(tmp_path):
+    write_csv(tmp_path / "dqc.csv", [DQC_COLUMNS, *DQC_ROWS[2:]])
+    other = ViolationBuffer()
+    other.read_dqc(tmp_path / "dqc.csv")
+    write_csv(tmp_path / "dqc.csv", [DQC_COLUMNS[::-1], *(row[::-1] for row in DQC_ROWS[:2])])
+    create_reports(ViolationBuffer(), tmp_path / "dqc.csv", tmp_path / "report.csv", others=[other])
+    assert read_csv(tmp_path / "dqc.csv") == [DQC_COLUMNS, *DQC_ROWS]
+
+
+def test_rules_hand_their_batches_to_the_buffer_and_violations_to_the_engine():
+    batch = ViolationBatch(
+        diagnosis="illegal depth",
+        table="ws",
+        column="depth",
+        row=[2, 5],
+        value=["12", "30"],
+        extended_diagnosis="depth must be less than or equal to tot_depth_water_col (10)",
+    )
+    violations = ViolationBuffer()
+    result = record_violations(lambda data_model: batch, violations)(None)
+    assert violations.batches == [batch]
+    assert [(v.table, v.column, v.row, v.value, v.diagnosis, v.repair) for v in result] == [
+        ("ws", "depth", 2, "12", "illegal depth", None),
+        ("ws", "depth", 5, "30", "illegal depth", None),
+    ]
+    library = ViolationBatch.from_violations(result)
+    assert library.to_violations() is result  # those of a library rule are handed over as they are
+
+
+@pytest.fixture
+def stand_in(monkeypatch):
+    with StandIn() as stand_in:
+        monkeypatch.setattr(action.lookups, "NCBI_ESUMMARY_URL", f"{stand_in.url}/esummary")
+        monkeypatch.setattr(action.lookups, "ORCID_API_URL", f"{stand_in.url}/orcid/{{orcid}}")
+        yield stand_in
+
+
+@pytest.mark.parametrize("options", [{}, {"rule_workers": 1}, {"incremental": True}])
+def test_dqc_csv_is_that_of_the_engine(tmp_path, stand_in, options):
+    workspace = generate_workspace(tmp_path / "crate", rows=100)
+    path = workspace / "logsheets/raw/water_sampling.csv"
+    path.write_text(path.read_text().replace(",3.0,", ",3.x,", 5))  # schema violations of size_frac_up
+    run_crate(workspace, sediment=True, water=True, threshold_date="2030-01-01", schema_config=generate_schema_config(), **options)
+
+    crate = Crate(workspace)
+    data_model = generate_data_model(
+        logsheets_path=crate.logsheets_filtered_path,
+        alias2basename={**ALIAS2BASENAME_SEDIMENT, **ALIAS2BASENAME_WATER},
+        schema_config=generate_schema_config(),
+    )
+    RuleEngine(data_model=data_model, rules=generate_rules("all", cache_path=crate.dqc_path / "cache")).execute(
+        report_path=tmp_path / "engine.csv"
+    )
+    assert (crate.dqc_path / "dqc.csv").read_bytes() == (tmp_path / "engine.csv").read_bytes()